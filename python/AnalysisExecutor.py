@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import collections
+import multiprocessing
+import multiprocessing.pool
+
+import numpy as np
+
+import sigproc
+from SharedCapture import SharedCapture
+
+def _init_worker():
+    """Pool workers already share the cores; their FFTs run single threaded."""
+    sigproc.set_fft_threads(1)
+
+class _Shared(object):
+    """A complex64 array, or row `index` of it, left in a SharedCapture"""
+
+    def __init__(self, name, shape, index=None):
+        self.name = name
+        self.shape = shape
+        self.index = index
+
+    def load(self):
+        array = SharedCapture.attach(self.name).array.reshape(self.shape)
+        return array if self.index is None else array[self.index]
+
+def _run(func, args, kwargs):
+    """Process pool side of a job: maps shared arguments back onto arrays"""
+    args = [arg.load() if isinstance(arg, _Shared) else arg for arg in args]
+    return func(*args, **kwargs)
+
+def _run_item(job):
+    func, arg = job
+    return func(arg.load())
+
+def _share(array):
+    """Copies a complex64 array into a new SharedCapture"""
+    capture = SharedCapture.create(int(np.prod(array.shape[:-1])), array.shape[-1])
+    capture.array[:] = array.reshape(capture.shape)
+    capture.flush()
+    return capture
+
+def _shareable(arg):
+    return isinstance(arg, np.ndarray) and arg.dtype == np.complex64 and arg.ndim >= 1
+
+class AnalysisExecutor(object):
+    """
+    Runs sigproc jobs, eg. peaks, areas, phase diffs or magnitude
+    comparisons of one (frequency, run, channel) capture, in a pool while
+    the next capture is acquired. Results come back in submission order.
+
+    kind "thread" uses a thread pool, which suits NumPy as it releases the
+    GIL; "process" uses a process pool, where jobs and their arguments must
+    be picklable (module level functions and arrays, not vector sinks).
+    Captures, complex64 array arguments, are not pickled to the processes
+    but put in a SharedCapture that the worker attaches to by name.
+    One worker runs every job inline at submission, without a pool.
+    """
+
+    # Defaults when not given to the constructor.
+    kind = "thread"
+    workers = None
+
+    def __init__(self, kind=None, workers=None):
+        if kind is not None:
+            self.kind = kind
+        if workers is not None:
+            self.workers = workers
+        if self.workers is None:
+            self.workers = multiprocessing.cpu_count()
+
+        if self.kind == "thread":
+            pool = multiprocessing.pool.ThreadPool
+        elif self.kind == "process":
+            pool = multiprocessing.Pool
+        else:
+            raise ValueError("Unknown executor kind %r" % self.kind)
+
+        self._pool = pool(self.workers, _init_worker) if self.workers > 1 else None
+        self._pending = collections.deque()
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(*args, **kwargs). Returns its multiprocessing AsyncResult."""
+        captures = []
+
+        if self._pool is None:
+            result = _Done(func, args, kwargs)
+        elif self.kind == "process":
+            shared = []
+            for arg in args:
+                if _shareable(arg):
+                    captures.append(_share(arg))
+                    arg = _Shared(captures[-1].name, arg.shape)
+                shared.append(arg)
+
+            result = self._pool.apply_async(_run, (func, shared, kwargs))
+        else:
+            result = self._pool.apply_async(func, args, kwargs)
+
+        self._pending.append((result, captures))
+        return result
+
+    def results(self):
+        """
+        Yields the results of the submitted jobs in submission order, each as
+        soon as it and all before it are done. A job's exception is raised here.
+        """
+        while self._pending:
+            result, captures = self._pending.popleft()
+            try:
+                yield result.get()
+            finally:
+                for capture in captures:
+                    capture.close()
+
+    def map(self, func, iterable):
+        """
+        Lazily yields func(item) for every item, in order. In a process pool
+        a complex64 array, eg. a (frequency x run x channel x sample) sweep,
+        goes into one SharedCapture and each job gets its (name, index).
+        """
+        if self._pool is None:
+            return (func(item) for item in iterable)
+        if self.kind == "process" and _shareable(iterable) and iterable.ndim >= 2:
+            return self._map_shared(func, iterable)
+        return self._pool.imap(func, iterable)
+
+    def _map_shared(self, func, array):
+        capture = _share(array)
+        try:
+            jobs = [(func, _Shared(capture.name, array.shape, index)) for index in xrange(len(array))]
+            for result in self._pool.imap(_run_item, jobs):
+                yield result
+        finally:
+            capture.close()
+
+    def close(self):
+        """Waits for all jobs and stops the workers."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+        for result, captures in self._pending:
+            for capture in captures:
+                capture.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None and self._pool is not None:
+            self._pool.terminate()
+        self.close()
+
+
+class _Done(object):
+    """An inline job, with the AsyncResult interface"""
+
+    def __init__(self, func, args, kwargs):
+        try:
+            self._value, self._error = func(*args, **kwargs), None
+        except Exception, e:
+            self._value, self._error = None, e
+
+    def ready(self):
+        return True
+
+    def successful(self):
+        return self._error is None
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self, timeout=None):
+        if self._error is not None:
+            raise self._error
+        return self._value
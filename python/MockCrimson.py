@@ -19,14 +19,38 @@
 # Boston, MA 02.0110-1301, USA.
 #
 
+import copy
+import ctypes
+import multiprocessing
+from collections import OrderedDict
+
 import numpy as np
 from MockCrimsonChannel import MockCrimsonChannel
 
+# Per process state of MockCrimson.sweep() workers.
+_sweep = {}
+
+def _sweep_init(crimson, freqs, shared, shape):
+    _sweep["crimson"] = crimson
+    _sweep["freqs"] = freqs
+    _sweep["captures"] = np.frombuffer(shared, dtype=np.complex64).reshape(shape)
+
+def _sweep_worker(job):
+    _sweep["crimson"]._sweep_job(job, _sweep["freqs"], _sweep["captures"])
+
 class MockCrimson(object):
     """
     x(t) = A*sin(2.0*pi*f*t)
     """
 
+    # Captures of sample() shared by all instances, least recently used
+    # first, bounded to cache_limit bytes (0 disables the cache).
+    cache_limit = 256 << 20
+    _cache = OrderedDict()
+    _cache_bytes = 0
+    _cache_hits = 0
+    _cache_misses = 0
+
     def __init__(self, num_channels=4, time=5, num_samples=64, sample_rate=2.00e6):
         self._amp = 1
         self._freq = 1/(2.0 * np.pi)
@@ -34,6 +58,8 @@ class MockCrimson(object):
         self._num_samples = num_samples
         self._sample_rate = sample_rate
         self._num_channels = num_channels
+        self._capture = None
+        self.set_impairments()
 
     @property
     def amp(self):
@@ -98,27 +124,288 @@ class MockCrimson(object):
         # Phase shift of pi/2.0 radians
         return self._amp * np.sin(2.0 * np.pi * self._freq * t + np.pi/2.0)
 
-    def __generate_data(self):
-        data = []
+    def __time_vector(self, start, count):
+        """Sample instants for `count` samples beginning at sample index `start`"""
+        # Computed from the sample index rather than accumulated so the
+        # same configuration always yields the same instants.
+        n = np.arange(start, start + count, dtype=np.float64)
+        return self._time / 2.0 + n * (self._time / 2.0 / self._sample_rate)
+
+    def __waveform(self, t, out):
+        """Evaluates the wave at instants `t` into the complex64 array `out`"""
+        out.real = self.__sine_real(t)
+        out.imag = self.__sine_imag(t)
+        return out
+
+    def set_impairments(self, snr=None, phase_offset=0.0, freq_offset=0.0, dc_offset=0.0,
+            iq_gain=0.0, iq_phase=0.0, jitter=0.0, seed=0):
+        """
+        Configures the RF impairments applied to every capture. All but
+        `jitter` and `seed` take a scalar or one value per channel.
+
+            snr          - AWGN signal to noise ratio in dB (None: no noise)
+            phase_offset - Phase offset in radians
+            freq_offset  - Carrier frequency offset in Hz
+            dc_offset    - Complex DC offset
+            iq_gain      - Q branch gain imbalance (0.05 is +5%)
+            iq_phase     - Q branch phase imbalance in radians
+            jitter       - RMS sample time jitter in seconds
+            seed         - Noise and jitter seed. Channel c draws from (seed, c).
+        """
+
+        self._impairments = {
+            "snr": snr,
+            "phase_offset": phase_offset,
+            "freq_offset": freq_offset,
+            "dc_offset": dc_offset,
+            "iq_gain": iq_gain,
+            "iq_phase": iq_phase,
+            "jitter": jitter,
+            "seed": seed,
+        }
+
+    @property
+    def impairments(self):
+        """RF Impairments"""
+        return dict(self._impairments)
+
+    def __rngs(self):
+        """One random stream per channel, reproducible from the seed"""
+        return [np.random.RandomState([self._impairments["seed"], channel])
+            for channel in xrange(self._num_channels)]
+
+    def __fill(self, block, start, rngs, channels=None):
+        """
+        Fills a (channels x count) block beginning at sample index `start`.
+        Row i of the block is channel channels[i] (default: all channels).
+        """
+        if len(block) == 0:
+            return
+
+        count = block.shape[1]
+        t = self.__time_vector(start, count)
+        jitter = self._impairments["jitter"]
+
+        if jitter:
+            # Every channel samples at its own perturbed instants.
+            t = np.tile(t, (len(block), 1))
+            for channel, rng in enumerate(rngs):
+                t[channel] += rng.normal(0.0, jitter, count)
+
+            self.__waveform(t, block)
+        else:
+            # All channels share the same waveform: compute it once and copy.
+            self.__waveform(t, block[0])
+            block[1:] = block[0]
+
+        self.__impair(block, t, rngs, channels)
+
+    def __impair(self, block, t, rngs, channels=None):
+        """Applies the configured impairments to the whole block in place"""
+        imp = self._impairments
+        count = block.shape[1]
+
+        if channels is None:
+            channels = xrange(self._num_channels)
+        channels = list(channels)
+
+        def per_channel(value, dtype=np.float64):
+            value = np.broadcast_to(np.asarray(value, dtype=dtype), (self._num_channels,))
+            return value[channels][:, np.newaxis]
+
+        phase_offset = per_channel(imp["phase_offset"])
+        freq_offset = per_channel(imp["freq_offset"])
+        if np.any(phase_offset) or np.any(freq_offset):
+            theta = phase_offset + 2.0 * np.pi * freq_offset * t
+
+            rotation = np.empty(theta.shape, dtype=np.complex64)
+            rotation.real = np.cos(theta)
+            rotation.imag = np.sin(theta)
+            block *= rotation
+
+        iq_gain = per_channel(imp["iq_gain"])
+        iq_phase = per_channel(imp["iq_phase"])
+        if np.any(iq_gain) or np.any(iq_phase):
+            block.imag = (1.0 + iq_gain) * (block.imag * np.cos(iq_phase) - block.real * np.sin(iq_phase))
+
+        dc_offset = per_channel(imp["dc_offset"], np.complex128)
+        if np.any(dc_offset):
+            block += dc_offset.astype(np.complex64)
+
+        if imp["snr"] is not None:
+            snr = per_channel(imp["snr"])[:, 0]
+
+            # Per component deviation for a signal power of amp^2.
+            sigma = np.sqrt(self._amp ** 2 / 10.0 ** (snr / 10.0) / 2.0)
+            for channel, rng in enumerate(rngs):
+                noise = rng.standard_normal(2 * count).astype(np.float32)
+                noise *= sigma[channel]
+                block[channel] += noise.view(np.complex64)
+
+    def _sweep_job(self, job, freqs, captures):
+        """Fills captures[f, run, channel] for one (f, run, channel) job"""
+        f, run, channel = job
+
+        crimson = copy.copy(self)
+        crimson._freq = freqs[f]
+
+        rng = np.random.RandomState([self._impairments["seed"], f, run, channel])
+        crimson.__fill(captures[f, run, channel:channel + 1], 0, [rng], [channel])
+
+    def sweep(self, freqs, runs=1, processes=None):
+        """
+        Generates a capture for every frequency in `freqs` and run, and
+        returns them as a read-only (freqs x runs x channels x samples) array.
 
-        t = self._time / 2.0
-        while len(data) < self._num_samples:
-            data.append(complex(self.__sine_real(t), self.__sine_imag(t)))
-            t += self._time / 2.0  / self._sample_rate
+        The (frequency, run, channel) jobs are spread across `processes`
+        worker processes (default: one per core, 1: no pool) that write
+        straight into shared memory. Each job draws from its own random
+        stream seeded with (seed, frequency index, run, channel), so the
+        result does not depend on the number of processes.
+        """
 
-        return data
+        freqs = np.asarray(freqs, dtype=np.float64)
+        shape = (len(freqs), runs, self._num_channels, self._num_samples)
+
+        # Two floats per complex64 sample.
+        shared = multiprocessing.RawArray(ctypes.c_float, 2 * int(np.prod(shape)))
+        captures = np.frombuffer(shared, dtype=np.complex64).reshape(shape)
+
+        jobs = [(f, run, channel)
+            for f in xrange(shape[0])
+            for run in xrange(shape[1])
+            for channel in xrange(shape[2])]
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+
+        if processes == 1:
+            for job in jobs:
+                self._sweep_job(job, freqs, captures)
+        else:
+            pool = multiprocessing.Pool(processes, _sweep_init, (self, freqs, shared, shape))
+            try:
+                pool.map(_sweep_worker, jobs, chunksize=max(1, len(jobs) // (4 * processes)))
+            finally:
+                pool.close()
+                pool.join()
+
+        captures.setflags(write=False)
+        return captures
+
+    def sample(self, start=0):
+        """
+        Fills one (channels x samples) capture beginning at sample index
+        `start` and returns a vsnk whose channels are read-only views into it.
+        """
+
+        capture = self.__cached(start)
+        if capture is None:
+            capture = np.empty((self._num_channels, self._num_samples), dtype=np.complex64)
+            self.__fill(capture, start, self.__rngs())
+
+            capture.setflags(write=False)
+            self.__cache(capture, start)
+
+        self._capture = capture
 
-    def sample(self):
         vsnk = [None] * self._num_channels
 
         for x in xrange(len(vsnk)):
             vsnk[x] = MockCrimsonChannel()
-
-            data = self.__generate_data()
-            vsnk[x].update_data(data)
+            vsnk[x].update_data(capture[x])
 
         return vsnk
 
+    def __cache_key(self, start):
+        """Everything a capture of sample() depends on"""
+        impairments = tuple(
+            (name, tuple(np.ravel(value).tolist()) if value is not None else None)
+            for name, value in sorted(self._impairments.items()))
+
+        return (self._num_channels, self._amp, self._freq, self._time,
+            self._num_samples, self._sample_rate, impairments, start)
+
+    def __cached(self, start):
+        """Returns the cached capture of this configuration or None"""
+        cls = MockCrimson
+        key = self.__cache_key(start)
+
+        capture = cls._cache.pop(key, None)
+        if capture is None:
+            cls._cache_misses += 1
+            return None
+
+        # Reinsert as most recently used.
+        cls._cache[key] = capture
+        cls._cache_hits += 1
+        return capture
+
+    def __cache(self, capture, start):
+        cls = MockCrimson
+        if capture.nbytes > cls.cache_limit:
+            return
+
+        cls._cache[self.__cache_key(start)] = capture
+        cls._cache_bytes += capture.nbytes
+
+        while cls._cache_bytes > cls.cache_limit:
+            cls._cache_bytes -= cls._cache.popitem(last=False)[1].nbytes
+
+    @classmethod
+    def cache_info(cls):
+        """Returns the hits, misses, entries and bytes of the capture cache"""
+        return {
+            "hits": cls._cache_hits,
+            "misses": cls._cache_misses,
+            "entries": len(cls._cache),
+            "bytes": cls._cache_bytes,
+        }
+
+    @classmethod
+    def cache_clear(cls):
+        cls._cache.clear()
+        cls._cache_bytes = 0
+        cls._cache_hits = 0
+        cls._cache_misses = 0
+
+    def stream(self, chunk_size, num_samples=None, start=0):
+        """
+        Yields (channels x chunk_size) read-only blocks covering `num_samples`
+        samples (default: num_samples) from sample index `start` on, with
+        phase continuous across blocks. The final block is shorter when
+        num_samples is not a multiple of chunk_size.
+
+        One block is allocated for the whole stream and reused, so copy a
+        block if it must outlive the next iteration. Noise and jitter are
+        reproducible but not identical to those of sample().
+        """
+
+        if num_samples is None:
+            num_samples = self._num_samples
+
+        chunk_size = int(chunk_size)
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        block = np.empty((self._num_channels, chunk_size), dtype=np.complex64)
+        rngs = self.__rngs()
+
+        for offset in xrange(0, int(num_samples), chunk_size):
+            count = min(chunk_size, int(num_samples) - offset)
+            chunk = block[:, :count]
+
+            self.__fill(chunk, start + offset, rngs)
+
+            view = chunk.view()
+            view.setflags(write=False)
+            yield view
+
+    @property
+    def capture(self):
+        """Read-only (channels x samples) array from the last sample()"""
+        return self._capture
+
     def equation(self):
         """Returns a formatter string of the sine wave being generated"""
         return "x(t) = {:5.2f} * sin(2 * pi * {:5.2f} * t)".format(self._amp, self._freq)
@@ -19,16 +19,41 @@
 # Boston, MA 02110-1301, USA.
 #
 
+import numpy as np
+from sc16 import SC16_SCALE, to_sc16
+
 class MockCrimsonChannel(object):
     """
     Mock of a vsink channel. Required to match GRC's generated vsink.
+
+    Samples are held in a contiguous complex64 buffer and handed out as a
+    read-only view, so NumPy consumers use them without conversion.
     """
 
-    def __init__(self):
-        self._data = []
+    def __init__(self, data=None):
+        self._data = np.empty(0, dtype=np.complex64)
+
+        if data is not None:
+            self.update_data(data)
 
     def update_data(self, data):
-       self._data = data
+        # No copy when data already is a contiguous complex64 array.
+        data = np.ascontiguousarray(data, dtype=np.complex64)
+
+        view = data.view()
+        view.setflags(write=False)
+        self._data = view
 
     def data(self):
         return self._data
+
+    def data_as(self, dtype, scale=SC16_SCALE):
+        """
+        Returns the samples as `dtype`, or as interleaved I/Q shorts for
+        "sc16" (full scale 1.0 maps to `scale`).
+        """
+
+        if dtype == "sc16":
+            return to_sc16(self._data, scale)
+
+        return self._data.astype(dtype, copy=False)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import threading
+
+import numpy as np
+
+class MockCrimsonRingChannel(object):
+    """
+    Bounded variant of MockCrimsonChannel for continuous capture.
+
+    Holds the last `capacity` samples in a complex64 ring, overwriting the
+    oldest ones. data() returns a chronological snapshot, so it can be
+    handed to sigproc like any vsnk channel while samples keep arriving.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self._ring = np.zeros(int(capacity), dtype=np.complex64)
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        """Number of samples held"""
+        return len(self._ring)
+
+    @property
+    def samples_seen(self):
+        """Number of samples appended so far"""
+        return self._seen
+
+    @property
+    def samples_dropped(self):
+        """Number of samples overwritten (or skipped) so far"""
+        return max(0, self._seen - len(self._ring))
+
+    @property
+    def wrap_count(self):
+        """Number of times the ring has been filled"""
+        return self._seen // len(self._ring)
+
+    def append(self, samples):
+        samples = np.asarray(samples, dtype=np.complex64)
+        capacity = len(self._ring)
+
+        with self._lock:
+            count = len(samples)
+
+            # Only the last `capacity` samples can survive.
+            skip = max(0, count - capacity)
+            samples = samples[skip:]
+
+            pos = (self._seen + skip) % capacity
+            first = min(len(samples), capacity - pos)
+
+            self._ring[pos:pos + first] = samples[:first]
+            self._ring[:len(samples) - first] = samples[first:]
+
+            self._seen += count
+
+    def update_data(self, data):
+        self.reset()
+        self.append(data)
+
+    def reset(self):
+        with self._lock:
+            self._seen = 0
+
+    def snapshot(self, num_samples=None):
+        """
+        Returns a read-only copy of the last `num_samples` samples
+        (default: all held), oldest first.
+        """
+
+        with self._lock:
+            held = min(self._seen, len(self._ring))
+            if num_samples is None or num_samples > held:
+                num_samples = held
+
+            end = self._seen % len(self._ring)
+            start = (end - num_samples) % len(self._ring)
+
+            if num_samples and start >= end:
+                data = np.concatenate((self._ring[start:], self._ring[:end]))
+            else:
+                data = self._ring[start:end].copy()
+
+        data.setflags(write=False)
+        return data
+
+    def data(self):
+        return self.snapshot()
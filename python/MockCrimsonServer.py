@@ -0,0 +1,759 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+"""
+Local UDP stand-ins for the Crimson RX packet stream and TX sample sink.
+
+The server emits sc16 sample packets for N channels at a given sample rate
+and honours timed stream commands. The client is the host side: it issues
+the commands, receives the packets and accounts for drops, throughput and
+CPU usage so host receive limits can be measured without hardware.
+
++--------------------+  stream cmd  +--------------------+
+|                    |<-------------|                    |
+| MockCrimsonServer  |              | MockCrimsonClient  |----> vsnk
+|                    |------------->|                    |
++--------------------+  sc16 pkts   +--------------------+
+
+Packet layout (little endian):
+
+    channel (u16) | flags (u16) | samples (u32) | sequence (u32) | tick (u64)
+    I0 (i16) Q0 (i16) I1 (i16) Q1 (i16) ...
+
+The tick is the device time of the first sample, in samples.
+
+MockCrimsonSink is the TX side. It takes raw sc16 datagrams, one port per
+channel, and accounts for underflows, late packets and throughput against
+a virtual sample clock.
+
+NOTE: The framing is not the one the Crimson UHD driver speaks, so
+uhd.usrp_source cannot be pointed at this server; use mock_crimson_udp_source_c
+in flowgraphs instead.
+"""
+
+import errno
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+from MockCrimson import MockCrimson
+from MockCrimsonChannel import MockCrimsonChannel
+from sc16 import to_sc16, from_sc16
+
+# Stream modes, numbered as in uhd::stream_cmd_t::stream_mode_t.
+STREAM_MODE_START_CONTINUOUS = ord('a')
+STREAM_MODE_STOP_CONTINUOUS = ord('o')
+STREAM_MODE_NUM_SAMPS_AND_DONE = ord('d')
+STREAM_MODE_NUM_SAMPS_AND_MORE = ord('m')
+
+HEADER = struct.Struct("<HHIIQ")
+
+# The same header as a NumPy record, to build many packets at once.
+HEADER_DTYPE = np.dtype([("channel", "<u2"), ("flags", "<u2"), ("samples", "<u4"),
+    ("sequence", "<u4"), ("tick", "<u8")])
+
+# Header flags.
+FLAG_END_OF_BURST = 0x1
+
+# Linux ioctl reading the kernel receive time of the last datagram read,
+# as a struct timeval.
+SIOCGSTAMP = 0x8906
+TIMEVAL = struct.Struct("@ll")
+
+# Longest wave period, in samples, served from a precomputed table.
+WAVE_TABLE_PERIOD = 1 << 16
+
+def _secs(time_spec):
+    """Seconds of a uhd.time_spec_t or a plain number"""
+    if hasattr(time_spec, "get_real_secs"):
+        return time_spec.get_real_secs()
+    return float(time_spec)
+
+def _enable_rx_stamps(sock):
+    """
+    Makes the kernel timestamp datagrams arriving on `sock`. Returns False
+    where receive timestamps are not available.
+    """
+
+    if fcntl is None:
+        return False
+
+    # The first query turns timestamping on and finds no datagram yet.
+    try:
+        fcntl.ioctl(sock, SIOCGSTAMP, TIMEVAL.pack(0, 0))
+    except IOError as e:
+        return e.errno == errno.ENOENT
+    return True
+
+def _rx_stamp(sock):
+    """Wall time the last datagram read from `sock` arrived at"""
+    secs, usecs = TIMEVAL.unpack(fcntl.ioctl(sock, SIOCGSTAMP, TIMEVAL.pack(0, 0)))
+    return secs + usecs * 1e-6
+
+
+class MockCrimsonServer(object):
+    """
+    Emits sc16 packets for `num_channels` channels at `sample_rate`.
+
+    With `realtime` set, packets are paced against the device clock;
+    otherwise they are sent as fast as the host allows. A packet sent more
+    than one packet period after it was due counts as late, so a server
+    that cannot keep up with `sample_rate` says so in packets_late.
+
+    Samples are generated, converted and framed `poll_packets` packets
+    at a time, and commands are only checked between such blocks.
+    """
+
+    def __init__(self, num_channels=4, sample_rate=20e6, wave_freq=1e6, amp=0.5,
+            samples_per_packet=1024, host="127.0.0.1", port=0, realtime=True, poll_packets=32):
+        self._num_channels = num_channels
+        self._sample_rate = float(sample_rate)
+        self._samples_per_packet = samples_per_packet
+        self._realtime = realtime
+        self._poll_packets = poll_packets
+
+        # Unit sample period: time=2 makes MockCrimson step 1/sample_rate.
+        # Every channel carries the same wave, so only one is generated.
+        self._crimson = MockCrimson(1, 2.0, 0, sample_rate)
+        self._crimson.freq = wave_freq
+        self._crimson.amp = amp
+
+        # A wave repeating every `period` samples is converted to sc16 once;
+        # any block is then a slice of this table.
+        self._period = None
+        self._table = None
+        period = Fraction(wave_freq / self._sample_rate).limit_denominator(WAVE_TABLE_PERIOD)
+        if abs(float(period) - wave_freq / self._sample_rate) < 1e-12:
+            self._period = period.denominator
+            length = self._period + samples_per_packet * poll_packets
+            self._table = to_sc16(next(self._crimson.stream(length, length)))[0]
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+
+        self._epoch = time.time()
+        self._commands = []
+        self._stop = False
+        self._running = False
+        self._thread = None
+
+        self._packets_sent = 0
+        self._packets_late = 0
+
+    @property
+    def address(self):
+        """(host, port) the server listens on"""
+        return self._sock.getsockname()
+
+    @property
+    def packets_sent(self):
+        """Number of data packets sent so far, per channel"""
+        return self._packets_sent
+
+    @property
+    def packets_late(self):
+        """Number of packets, per channel, sent over a packet period late"""
+        return self._packets_late
+
+    def time_now(self):
+        """Device time in seconds"""
+        return time.time() - self._epoch
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._sock.close()
+
+    def _poll(self, block):
+        """Reads pending commands. Returns False once the server is stopped."""
+        timeout = 0.05 if block else 0.0
+
+        # Only wait for the first datagram. The socket itself stays blocking
+        # so sends wait rather than fail when its buffer is full.
+        while self._running and select.select([self._sock], [], [], timeout)[0]:
+            timeout = 0.0
+            msg, peer = self._sock.recvfrom(65536)
+
+            cmd = json.loads(msg.decode("ascii"))
+            if cmd["cmd"] == "set_time_now":
+                self._epoch = time.time() - cmd["time"]
+            elif cmd["cmd"] == "stream":
+                if cmd["stream_mode"] == STREAM_MODE_STOP_CONTINUOUS:
+                    self._commands = []
+                    self._stop = True
+                else:
+                    self._commands.append((cmd, peer))
+
+        return self._running
+
+    def _serve(self):
+        tick = 0
+
+        while self._poll(not self._commands):
+            if not self._commands:
+                continue
+
+            cmd, peer = self._commands.pop(0)
+            self._stop = False
+
+            if not cmd["stream_now"]:
+                tick = max(tick, int(round(cmd["time_spec"] * self._sample_rate)))
+            else:
+                tick = max(tick, int(round(self.time_now() * self._sample_rate)))
+
+            if cmd["stream_mode"] == STREAM_MODE_START_CONTINUOUS:
+                total = None
+            else:
+                total = cmd["num_samps"]
+
+            tick = self._burst(peer, tick, total, cmd["stream_mode"])
+
+    def _wave(self, tick, count):
+        """sc16 samples of the wave for `count` samples from `tick` on"""
+        if self._table is not None:
+            start = tick % self._period
+            return self._table[2 * start:2 * (start + count)]
+
+        return to_sc16(next(self._crimson.stream(count, count, tick)))[0]
+
+    def _burst(self, peer, tick, total, mode):
+        """Streams one burst starting at `tick`. Returns the tick after it."""
+        block = self._samples_per_packet * self._poll_packets
+        sent = 0
+
+        while total is None or sent < total:
+            count = block if total is None else min(block, total - sent)
+            last = total is not None and sent + count >= total
+            flags = FLAG_END_OF_BURST if last and mode == STREAM_MODE_NUM_SAMPS_AND_DONE else 0
+
+            # The waveform continues from the burst's tick, not from sample 0.
+            self._send(peer, self._wave(tick, count), tick, flags)
+
+            sent += count
+            tick += count
+
+            if not self._poll(False):
+                break
+
+            # Continuous streaming ends on a stop command or a newer command.
+            if total is None and (self._stop or self._commands):
+                break
+
+        return tick
+
+    def _send(self, peer, sc16, tick, flags):
+        """
+        Sends interleaved sc16 samples from `tick` on, on every channel, as
+        packets of samples_per_packet, `flags` set on the last one of each
+        channel.
+        """
+        spp = self._samples_per_packet
+        channels, count = self._num_channels, len(sc16) // 2
+        num_packets = -(-count // spp)
+
+        packets = np.zeros((channels, num_packets),
+            dtype=[("header", HEADER_DTYPE), ("payload", "<i2", (2 * spp,))])
+
+        samples = np.full(num_packets, spp, dtype=np.uint32)
+        samples[-1] = count - spp * (num_packets - 1)
+
+        header = packets["header"]
+        header["channel"] = np.arange(channels)[:, np.newaxis]
+        header["flags"][:, -1] = flags
+        header["samples"] = samples
+        header["sequence"] = (self._packets_sent + np.arange(num_packets)) & 0xffffffff
+        header["tick"] = tick + spp * np.arange(num_packets, dtype=np.uint64)
+
+        # Whole packets, then what is left for the last one.
+        full = count // spp
+        packets["payload"][:, :full] = sc16[:2 * spp * full].reshape(full, 2 * spp)
+        if full < num_packets:
+            packets["payload"][:, full, :2 * (count - spp * full)] = sc16[2 * spp * full:]
+
+        raw = packets.view(np.uint8).reshape(channels, num_packets, -1)
+        sizes = HEADER.size + 4 * samples
+
+        period = spp / self._sample_rate
+        for packet in xrange(num_packets):
+            if self._realtime:
+                delay = float(tick + packet * spp) / self._sample_rate - self.time_now()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    self._packets_late += 1
+
+            for channel in xrange(channels):
+                self._sock.sendto(raw[channel, packet, :sizes[packet]], peer)
+
+        self._packets_sent += num_packets
+
+
+class MockCrimsonClient(object):
+    """
+    Host side of the MockCrimsonServer link.
+
+    Accepts uhd.stream_cmd_t objects (or anything with the same attributes)
+    and keeps per channel packet, sample and drop counters.
+    """
+
+    def __init__(self, server_address, num_channels=4, sample_rate=20e6, recv_buffer_size=None):
+        self._server = server_address
+        self._num_channels = num_channels
+        self._sample_rate = float(sample_rate)
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if recv_buffer_size is not None:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer_size)
+        self._sock.bind(("127.0.0.1", 0))
+
+        # Received packets not yet read(), per channel, as [tick, flags, samples].
+        self._pending = [deque() for channel in xrange(num_channels)]
+
+        self.reset_stats()
+
+    @property
+    def address(self):
+        """(host, port) the client receives on"""
+        return self._sock.getsockname()
+
+    @property
+    def recv_buffer_size(self):
+        """Receive buffer size granted by the kernel"""
+        return self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    def reset_stats(self):
+        self._packets = [0] * self._num_channels
+        self._samples = [0] * self._num_channels
+        self._dropped = [0] * self._num_channels
+        self._next_seq = [None] * self._num_channels
+        self._first_seq = None
+        self._elapsed = 0.0
+        self._cpu = 0.0
+
+    def set_time_now(self, time_spec):
+        self._send({"cmd": "set_time_now", "time": _secs(time_spec)})
+
+    def issue_stream_cmd(self, sc):
+        self._send({
+            "cmd": "stream",
+            "stream_mode": int(sc.stream_mode),
+            "num_samps": int(sc.num_samps),
+            "stream_now": bool(sc.stream_now),
+            "time_spec": _secs(sc.time_spec),
+        })
+
+    def _send(self, cmd):
+        self._sock.sendto(json.dumps(cmd).encode("ascii"), self._server)
+
+    def _account(self, channel, count, seq):
+        # Every channel's packets of one instant share a sequence number, so
+        # a channel's first packet is due at the first one of any channel.
+        if self._first_seq is None:
+            self._first_seq = seq
+
+        expected = self._next_seq[channel]
+        if expected is None:
+            expected = self._first_seq
+        if seq != expected:
+            self._dropped[channel] += (seq - expected) & 0xffffffff
+
+        self._next_seq[channel] = (seq + 1) & 0xffffffff
+        self._packets[channel] += 1
+        self._samples[channel] += count
+
+    def receive(self, num_samps, timeout=5.0):
+        """
+        Receives a burst of `num_samps` samples per channel and returns it
+        as a vsnk. Samples of dropped packets are left as zeros.
+        """
+
+        capture = np.zeros((self._num_channels, num_samps), dtype=np.complex64)
+        filled = [0] * self._num_channels
+        done = [False] * self._num_channels
+
+        # The burst starts at the tick of the first packet of any channel:
+        # the server sends every channel's packet of an instant before the
+        # next one, so a channel whose first packet is later lost some.
+        first_tick = [None]
+
+        def handle(channel, flags, count, tick, payload):
+            if first_tick[0] is None:
+                first_tick[0] = tick
+
+            offset = tick - first_tick[0]
+            if 0 <= offset < num_samps:
+                data = from_sc16(payload)[:num_samps - offset]
+                capture[channel, offset:offset + len(data)] = data
+                filled[channel] = offset + len(data)
+
+            if flags & FLAG_END_OF_BURST or filled[channel] >= num_samps:
+                done[channel] = True
+
+            return all(done)
+
+        self._run(handle, timeout)
+
+        vsnk = [None] * self._num_channels
+        for channel in xrange(self._num_channels):
+            vsnk[channel] = MockCrimsonChannel()
+            vsnk[channel].update_data(capture[channel])
+
+        return vsnk
+
+    def read(self, max_samps, timeout=0.1):
+        """
+        Returns (samples, tick, end_of_burst) for the next received
+        samples: a channels x count array of at most `max_samps` samples
+        starting at device tick `tick`, and whether they end a burst.
+        Samples are returned once every channel has them, or once they
+        failed to reach a channel for `timeout` after reaching another;
+        samples of dropped packets read as zeros. If nothing arrives within
+        `timeout` the array is empty and tick None.
+        """
+
+        pending = self._pending
+
+        def handle(channel, flags, count, tick, payload):
+            pending[channel].append([tick, flags, from_sc16(payload)])
+            return all(pending)
+
+        # Wait for any samples, then for the channels still missing them.
+        if not any(pending):
+            self._run(lambda *packet: handle(*packet) or True, timeout)
+        if any(pending) and not all(pending):
+            self._run(handle, timeout)
+
+        # A channel with nothing queued by now lost its packets, and one
+        # whose next packet starts later lost the packets between.
+        queued = [queue for queue in pending if queue]
+        if not queued:
+            return np.zeros((self._num_channels, 0), dtype=np.complex64), None, False
+
+        tick = min(queue[0][0] for queue in queued)
+        count = max_samps
+        for queue in queued:
+            start, flags, data = queue[0]
+            count = min(count, start - tick if start > tick else len(data))
+
+        samples = np.zeros((self._num_channels, count), dtype=np.complex64)
+        end_of_burst = False
+
+        for channel, queue in enumerate(pending):
+            if not queue or queue[0][0] > tick:
+                continue
+
+            packet = queue[0]
+
+            samples[channel] = packet[2][:count]
+            if count == len(packet[2]):
+                queue.popleft()
+                end_of_burst = end_of_burst or bool(packet[1] & FLAG_END_OF_BURST)
+            else:
+                packet[0] += count
+                packet[2] = packet[2][count:]
+
+        return samples, tick, end_of_burst
+
+    def drain(self, duration):
+        """
+        Receives and discards packets for `duration` seconds, only counting
+        them. Use stats() afterwards.
+        """
+
+        self._run(lambda *args: False, duration)
+
+    def _run(self, handle, timeout):
+        wall = time.time()
+        cpu = sum(os.times()[:2])
+        deadline = wall + timeout
+
+        buf = bytearray(65536)
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            self._sock.settimeout(remaining)
+            try:
+                size = self._sock.recv_into(buf)
+            except socket.timeout:
+                break
+
+            channel, flags, count, seq, tick = HEADER.unpack_from(buf)
+            self._account(channel, count, seq)
+
+            payload = np.frombuffer(buf, dtype="<i2", count=(size - HEADER.size) // 2, offset=HEADER.size)
+            if handle(channel, flags, count, tick, payload):
+                break
+
+        self._elapsed += time.time() - wall
+        self._cpu += sum(os.times()[:2]) - cpu
+
+    def stats(self):
+        """
+        Returns per channel packets, samples, dropped packets and achieved
+        MS/s, plus process CPU seconds spent per second per MS/s received.
+        """
+
+        elapsed = self._elapsed if self._elapsed > 0 else float("inf")
+        msps = [samples / elapsed / 1e6 for samples in self._samples]
+        total_msps = sum(msps)
+
+        return {
+            "packets": list(self._packets),
+            "samples": list(self._samples),
+            "dropped": list(self._dropped),
+            "msps": msps,
+            "elapsed": self._elapsed,
+            "cpu": self._cpu,
+            "cpu_per_msps": (self._cpu / elapsed / total_msps) if total_msps else 0.0,
+            "recv_buffer_size": self.recv_buffer_size,
+        }
+
+    def close(self):
+        self._sock.close()
+
+
+class MockCrimsonSink(object):
+    """
+    Stand-in for the TX side: consumes raw sc16 datagrams, one UDP port per
+    channel, as sent by mock_crimson_sink_s.
+
+    Each channel models the device FIFO of `buffer_size` samples drained by
+    a virtual sample clock at `sample_rate`. As on the device, the clock
+    only starts once `prefill` samples (default: half the FIFO) are queued.
+    A datagram arriving after its samples were due is late; each time the
+    FIFO runs dry counts as one underflow. Samples arriving while the FIFO
+    is full are dropped.
+
+    Arrivals are timed by the kernel receive timestamp where the platform
+    has one, so a sink thread falling behind does not show up as late
+    packets; how far behind it fell is reported as its lag instead.
+    """
+
+    def __init__(self, num_channels=4, sample_rate=20e6, buffer_size=1 << 16, host="127.0.0.1",
+            recv_buffer_size=None, prefill=None):
+        self._num_channels = num_channels
+        self._sample_rate = float(sample_rate)
+        self._buffer_size = buffer_size
+        self._prefill = buffer_size // 2 if prefill is None else prefill
+
+        self._socks = []
+        for channel in xrange(num_channels):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if recv_buffer_size is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer_size)
+            sock.bind((host, 0))
+            self._socks.append(sock)
+
+        self._kernel_stamps = all(_enable_rx_stamps(sock) for sock in self._socks)
+
+        self._epoch = time.time()
+        self._running = False
+        self._thread = None
+
+        self.reset_stats()
+
+    @property
+    def addresses(self):
+        """(host, port) to send each channel to"""
+        return [sock.getsockname() for sock in self._socks]
+
+    @property
+    def kernel_stamps(self):
+        """Whether arrivals are timed by the kernel rather than the sink thread"""
+        return self._kernel_stamps
+
+    def set_time_now(self, time_spec):
+        """Sets the device time and restarts every channel's sample clock"""
+        self._epoch = time.time() - _secs(time_spec)
+        self.reset_stats()
+
+    def time_now(self):
+        """Device time in seconds"""
+        return time.time() - self._epoch
+
+    def reset_stats(self):
+        self._first = [None] * self._num_channels
+        self._start = [None] * self._num_channels
+        self._last = [None] * self._num_channels
+        self._queued = [0] * self._num_channels
+        self._underflowing = [False] * self._num_channels
+
+        self._packets = [0] * self._num_channels
+        self._samples = [0] * self._num_channels
+        self._late = [0] * self._num_channels
+        self._underflows = [0] * self._num_channels
+        self._dropped = [0] * self._num_channels
+        self._lag = [0.0] * self._num_channels
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for sock in self._socks:
+            sock.close()
+
+    def _serve(self):
+        buf = bytearray(65536)
+
+        while self._running:
+            ready = select.select(self._socks, [], [], 0.05)[0]
+
+            for sock in ready:
+                size = sock.recv_into(buf)
+                now = time.time()
+                arrived = _rx_stamp(sock) if self._kernel_stamps else now
+
+                channel = self._socks.index(sock)
+                self._lag[channel] = max(self._lag[channel], now - arrived)
+                self.consume(channel, size // 4, arrived)
+
+    def consume(self, channel, count, now):
+        """
+        Accounts for `count` samples of `channel` arriving at wall time `now`.
+        """
+
+        if self._first[channel] is None:
+            self._first[channel] = now
+
+        if self._start[channel] is None:
+            # Still prefilling: nothing is played out until enough is queued.
+            accepted = min(count, self._buffer_size - self._queued[channel])
+            self._dropped[channel] += count - accepted
+            self._queued[channel] += accepted
+
+            if self._queued[channel] >= self._prefill:
+                self._start[channel] = now
+        else:
+            # Samples the DAC has played out since its clock started.
+            due = int((now - self._start[channel]) * self._sample_rate)
+
+            if self._queued[channel] < due:
+                # FIFO ran dry before this datagram arrived: zeros were played.
+                self._late[channel] += 1
+                if not self._underflowing[channel]:
+                    self._underflows[channel] += 1
+                    self._underflowing[channel] = True
+                self._queued[channel] = due
+            else:
+                self._underflowing[channel] = False
+
+            room = due + self._buffer_size - self._queued[channel]
+            accepted = min(count, room)
+            self._dropped[channel] += count - accepted
+            self._queued[channel] += accepted
+
+        self._packets[channel] += 1
+        self._samples[channel] += count
+        self._last[channel] = now
+
+    def stats(self):
+        """
+        Returns per channel packets, samples, late packets, underflows,
+        dropped samples, achieved MS/s and the most seconds the sink
+        thread read a datagram after it arrived.
+        """
+
+        msps = []
+        for channel in xrange(self._num_channels):
+            if self._first[channel] is None or self._last[channel] <= self._first[channel]:
+                msps.append(0.0)
+            else:
+                msps.append(self._samples[channel] / (self._last[channel] - self._first[channel]) / 1e6)
+
+        return {
+            "packets": list(self._packets),
+            "samples": list(self._samples),
+            "late": list(self._late),
+            "underflows": list(self._underflows),
+            "dropped": list(self._dropped),
+            "msps": msps,
+            "lag": list(self._lag),
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crimson RX packet stream and TX sink stand-in")
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20e6)
+    parser.add_argument("--port", type=int, default=42836)
+    parser.add_argument("--spp", type=int, default=1024, help="samples per packet")
+    parser.add_argument("--no-realtime", action="store_true", help="send as fast as possible")
+    parser.add_argument("--tx", action="store_true", help="run the TX sink instead")
+    args = parser.parse_args()
+
+    if args.tx:
+        server = MockCrimsonSink(args.channels, args.rate, host="0.0.0.0")
+        server.start()
+
+        for channel, address in enumerate(server.addresses):
+            print "Sinking channel %d at %.2f MS/s on %s:%d" % ((channel, args.rate / 1e6) + address)
+    else:
+        server = MockCrimsonServer(args.channels, args.rate, samples_per_packet=args.spp,
+            host="0.0.0.0", port=args.port, realtime=not args.no_realtime)
+        server.start()
+
+        print "Serving %d channels at %.2f MS/s on %s:%d" % ((args.channels, args.rate / 1e6) + server.address)
+
+    try:
+        while True:
+            time.sleep(1.0)
+            if args.tx:
+                print server.stats()
+    except KeyboardInterrupt:
+        server.close()
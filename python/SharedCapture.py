@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import os
+import struct
+import tempfile
+import uuid
+
+import numpy as np
+from MockCrimsonChannel import MockCrimsonChannel
+
+# Memory backed on Linux; a plain file elsewhere.
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# magic, channels, samples. Data starts at HEADER_SIZE for alignment.
+HEADER = struct.Struct("<8sIQ")
+HEADER_SIZE = 64
+MAGIC = b"PVCAPTUR"
+
+class SharedCapture(object):
+    """
+    (channels x samples) complex64 capture in a named memory-mapped file.
+
+    Any process can attach to it by name and work on the same memory
+    without copying or pickling samples:
+
+        capture = SharedCapture.from_vsnk(vsnk)
+        pool.map(job, [(capture.name, channel) for channel in ...])
+
+        def job(args):
+            capture = SharedCapture.attach(args[0])
+            return sigproc.channel_peaks([capture.vsnk()[args[1]]])
+
+    The creator owns the capture and unlinks it on close().
+    """
+
+    def __init__(self, name, array, owner):
+        self._name = name
+        self._array = array
+        self._owner = owner
+
+    @staticmethod
+    def path(name):
+        """File backing the capture called `name`"""
+        return os.path.join(SHARED_DIR, "pv-capture-%s" % name)
+
+    @classmethod
+    def create(cls, num_channels, num_samples, name=None):
+        """Creates a zeroed capture, named uniquely unless `name` is given"""
+        if name is None:
+            name = uuid.uuid4().hex
+
+        path = cls.path(name)
+        size = HEADER_SIZE + num_channels * num_samples * np.dtype(np.complex64).itemsize
+
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, num_channels, num_samples))
+            f.truncate(size)
+
+        array = np.memmap(path, dtype=np.complex64, mode="r+",
+            offset=HEADER_SIZE, shape=(num_channels, num_samples))
+
+        return cls(name, array, True)
+
+    @classmethod
+    def from_vsnk(cls, vsnk, name=None):
+        """Creates a capture holding a copy of a vsnk (or 2-D array)"""
+        rows = [channel if isinstance(channel, np.ndarray) else channel.data() for channel in vsnk]
+
+        capture = cls.create(len(rows), len(rows[0]), name)
+        for channel, row in enumerate(rows):
+            capture.array[channel] = row
+
+        return capture
+
+    @classmethod
+    def attach(cls, name, readonly=True):
+        """Maps an existing capture created by another process"""
+        path = cls.path(name)
+
+        with open(path, "rb") as f:
+            magic, num_channels, num_samples = HEADER.unpack(f.read(HEADER.size))
+
+        if magic != MAGIC:
+            raise ValueError("%s is not a capture" % path)
+
+        array = np.memmap(path, dtype=np.complex64, mode="r" if readonly else "r+",
+            offset=HEADER_SIZE, shape=(num_channels, num_samples))
+
+        return cls(name, array, False)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def array(self):
+        """The (channels x samples) array"""
+        return self._array
+
+    @property
+    def shape(self):
+        return self._array.shape
+
+    def vsnk(self):
+        """Returns channels viewing the capture, as sigproc expects"""
+        return [MockCrimsonChannel(self._array[channel]) for channel in xrange(len(self._array))]
+
+    def flush(self):
+        self._array.flush()
+
+    def close(self):
+        """Unmaps the capture; the creator also removes it"""
+        if self._array is None:
+            return
+
+        self._array = None
+        if self._owner:
+            os.remove(self.path(self._name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr
+from gnuradio import blocks
+
+from MockCrimsonServer import MockCrimsonSink
+
+def mock_crimson_sink_s(channels, sample_rate, center_freq, gain, addresses=None, payload_size=4096):
+    """
+    Returns a sink object expecting interleaved shorts of complex data, in
+    place of crimson_sink_s, that sends each channel as raw sc16 datagrams
+    to the matching entry of `addresses` (see MockCrimsonSink.addresses).
+
+    Without `addresses` the sink runs its own MockCrimsonSink, available as
+    its `mock` attribute for stats(). Each channel is throttled to
+    `sample_rate`, as the device paces its host, so the stand-in sees
+    underflows only where the host cannot keep up.
+    """
+
+    sink = gr.hier_block2(
+        "mock_crimson_sink_s",
+        gr.io_signature(len(channels), len(channels), 4),
+        gr.io_signature(0, 0, 0))
+
+    sink.mock = None
+    if addresses is None:
+        sink.mock = MockCrimsonSink(len(channels), sample_rate)
+        sink.mock.start()
+        addresses = sink.mock.addresses
+
+    sink.throttles = [
+        blocks.throttle(4, sample_rate)
+        for index in xrange(len(channels))]
+
+    sink.udp_sinks = [
+        blocks.udp_sink(4, addresses[index][0], addresses[index][1], payload_size, False)
+        for index in xrange(len(channels))]
+
+    for index in xrange(len(channels)):
+        sink.connect((sink, index), sink.throttles[index], sink.udp_sinks[index])
+
+    def set_time_now(time_spec):
+        if sink.mock is not None:
+            sink.mock.set_time_now(time_spec)
+
+    sink.set_time_now = set_time_now
+
+    return sink
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import time
+
+import numpy as np
+import pmt
+from gnuradio import gr
+from gnuradio import uhd
+
+from MockCrimson import MockCrimson
+from MockCrimsonServer import _secs
+
+def _tag_rx_time(block, num_outputs, offset, secs):
+    """Tags item `offset` of the first `num_outputs` outputs of `block` with rx_time `secs`"""
+    value = pmt.make_tuple(pmt.from_uint64(int(secs)), pmt.from_double(secs - int(secs)))
+
+    for channel in xrange(num_outputs):
+        block.add_item_tag(channel, offset, pmt.intern("rx_time"), value)
+
+class mock_crimson_source_c(gr.sync_block):
+    """
+    Complex source with one output per channel generating MockCrimson
+    samples, in place of crimson_source_c.
+
+    The device clock is virtual: an integer sample tick counted from the
+    time given to set_time_now(). It jumps to the tick of a timed stream
+    command and otherwise advances by one per delivered sample, and a burst
+    starting at tick n delivers MockCrimson samples from index n on, so
+    consecutive bursts stay phase continuous. Nothing waits for wall-clock
+    time, so a flowgraph can simply be run(): once the last
+    num-samps-and-done burst is delivered the source reports WORK_DONE.
+
+    Num-samps-and-done bursts come from MockCrimson.sample(), so repeated
+    identical captures are served from its cache.
+
+    The first sample of every burst carries an rx_time tag, as from
+    uhd.usrp_source.
+    """
+
+    # Samples per channel generated at once.
+    chunk_size = 8192
+
+    def __init__(self, channels, sample_rate, center_freq, gain, test_time=5.0):
+        gr.sync_block.__init__(self,
+            name="mock_crimson_source_c",
+            in_sig=None,
+            out_sig=[np.complex64] * len(channels))
+
+        self._channels = channels
+        self._gain = gain
+        self._sample_rate = float(sample_rate)
+
+        self.crimson = MockCrimson(len(channels), test_time, 0, sample_rate)
+        self.crimson.freq = center_freq
+
+        self._t0 = 0.0
+        self._tick = 0
+        self._commands = []
+
+        self._stream = None
+        self._mode = None
+        self._burst_start = None
+        self._chunk = np.empty((len(channels), 0), dtype=np.complex64)
+        self._pos = 0
+
+    def set_time_now(self, time_spec):
+        self._t0 = _secs(time_spec)
+        self._tick = 0
+
+    def _secs_now(self):
+        return self._t0 + self._tick / self._sample_rate
+
+    def get_time_now(self):
+        """Virtual device time"""
+        return uhd.time_spec_t(self._secs_now())
+
+    def issue_stream_cmd(self, sc):
+        if sc.stream_mode == uhd.stream_cmd_t.STREAM_MODE_STOP_CONTINUOUS:
+            self._commands = []
+            self._stream = None
+            return
+
+        self._commands.append((sc.stream_mode, sc.num_samps, sc.stream_now, _secs(sc.time_spec)))
+
+    def _next_burst(self):
+        """Starts the next queued command. Returns False if there is none."""
+        if not self._commands:
+            return False
+
+        mode, num_samps, stream_now, time_spec = self._commands.pop(0)
+
+        if mode == uhd.stream_cmd_t.STREAM_MODE_START_CONTINUOUS:
+            num_samps = 1 << 62
+
+        # Skip straight to the commanded tick instead of waiting for it.
+        if not stream_now:
+            self._tick = max(self._tick, int(round((time_spec - self._t0) * self._sample_rate)))
+
+        capture_bytes = num_samps * len(self._channels) * np.dtype(np.complex64).itemsize
+        if mode == uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE and capture_bytes <= MockCrimson.cache_limit:
+            # The whole burst as one cached capture.
+            self.crimson.num_samples = num_samps
+            self.crimson.sample(self._tick)
+            self._stream = iter([self.crimson.capture])
+        else:
+            self._stream = self.crimson.stream(self.chunk_size, num_samps, self._tick)
+
+        self._mode = mode
+        self._burst_start = self._secs_now()
+        self._chunk = self._chunk[:, :0]
+        self._pos = 0
+
+        return True
+
+    def work(self, input_items, output_items):
+        if self._stream is None and not self._next_burst():
+            if self._mode == uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE:
+                return -1
+
+            # Nothing commanded yet; do not spin the scheduler.
+            time.sleep(0.001)
+            return 0
+
+        n = len(output_items[0])
+        produced = 0
+
+        while produced < n:
+            if self._pos == self._chunk.shape[1]:
+                try:
+                    self._chunk = next(self._stream)
+                except StopIteration:
+                    self._stream = None
+                    if not self._next_burst():
+                        break
+                    continue
+                self._pos = 0
+
+            if self._burst_start is not None:
+                _tag_rx_time(self, len(self._channels), self.nitems_written(0) + produced, self._burst_start)
+                self._burst_start = None
+
+            count = min(n - produced, self._chunk.shape[1] - self._pos)
+            for channel, out in enumerate(output_items):
+                out[produced:produced + count] = self._chunk[channel, self._pos:self._pos + count]
+
+            produced += count
+            self._pos += count
+            self._tick += count
+
+        return produced
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import numpy as np
+from gnuradio import gr
+from gnuradio import uhd
+
+from MockCrimsonServer import MockCrimsonServer, MockCrimsonClient
+from mock_crimson_source_c import _tag_rx_time
+
+class mock_crimson_udp_source_c(gr.sync_block):
+    """
+    Complex source with one output per channel receiving from a
+    MockCrimsonServer over UDP, in place of crimson_source_c.
+
+    Unlike mock_crimson_source_c the samples cross the loopback interface
+    as sc16 packets, so flowgraphs built on it see host receive limits.
+    Without a `server_address` the block runs its own server, paced in
+    real time only if `realtime` is set.
+
+    Once the last num-samps-and-done burst is delivered the source reports
+    WORK_DONE. The first sample of every burst carries an rx_time tag, as
+    from uhd.usrp_source.
+    """
+
+    def __init__(self, channels, sample_rate, center_freq, gain, server_address=None, realtime=False):
+        gr.sync_block.__init__(self,
+            name="mock_crimson_udp_source_c",
+            in_sig=None,
+            out_sig=[np.complex64] * len(channels))
+
+        self._channels = channels
+        self._gain = gain
+        self._sample_rate = float(sample_rate)
+
+        self.server = None
+        if server_address is None:
+            self.server = MockCrimsonServer(len(channels), sample_rate, realtime=realtime)
+            self.server.start()
+            server_address = self.server.address
+
+        self.client = MockCrimsonClient(server_address, len(channels), sample_rate)
+
+        self._mode = None
+        self._bursts = 0
+        self._next_tick = None
+
+    def set_time_now(self, time_spec):
+        self.client.set_time_now(time_spec)
+
+    def issue_stream_cmd(self, sc):
+        if sc.stream_mode == uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE:
+            self._bursts += 1
+        elif sc.stream_mode == uhd.stream_cmd_t.STREAM_MODE_STOP_CONTINUOUS:
+            self._bursts = 0
+
+        self._mode = sc.stream_mode
+        self.client.issue_stream_cmd(sc)
+
+    def work(self, input_items, output_items):
+        if self._mode == uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE and self._bursts == 0:
+            return -1
+
+        samples, tick, end_of_burst = self.client.read(len(output_items[0]))
+        if tick is None:
+            return 0
+
+        # A burst starts wherever the device clock does not follow on.
+        if tick != self._next_tick:
+            _tag_rx_time(self, len(self._channels), self.nitems_written(0), tick / self._sample_rate)
+
+        count = samples.shape[1]
+        for channel, out in enumerate(output_items):
+            out[:count] = samples[channel]
+
+        if end_of_burst:
+            self._bursts = max(self._bursts - 1, 0)
+            self._next_tick = None
+        else:
+            self._next_tick = tick + count
+
+        return count
+
+    def stop(self):
+        self.client.close()
+        if self.server is not None:
+            self.server.close()
+        return True
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr_unittest
+
+from AnalysisExecutor import AnalysisExecutor
+from MockCrimson import MockCrimson
+from SharedCapture import SHARED_DIR
+import sigproc
+
+import numpy as np
+import os
+
+def fail(x):
+    raise ValueError(x)
+
+def shared(capture):
+    """True when a process pool job got its capture from shared memory"""
+    return isinstance(capture, np.memmap) or isinstance(capture.base, np.memmap)
+
+def fft_threads():
+    return getattr(sigproc._fft_local, "threads", sigproc.FFT_THREADS)
+
+class qa_analysis_executor(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure sigproc jobs give the same, in order, results whichever
+           pool runs them.
+    """
+
+    def setUp(self):
+        crimson = MockCrimson(4, 5.0, 4096, 20e6)
+        crimson.set_impairments(snr=30.0, seed=1)
+        self.sweep = crimson.sweep(np.arange(15e6, 95e6, 10e6), runs=3, processes=1)
+
+    def tearDown(self):
+        pass
+
+    def check(self, kind, workers):
+        with AnalysisExecutor(kind, workers) as executor:
+            for runs in self.sweep:
+                executor.submit(sigproc.absolute_area, runs)
+            areas = list(executor.results())
+
+            peaks = list(executor.map(sigproc.channel_peaks, self.sweep[:, 0]))
+
+        self.assertEqual(len(areas), len(self.sweep))
+        for runs, area, peak in zip(self.sweep, areas, peaks):
+            self.assertTrue(np.allclose(area, sigproc.absolute_area(runs)))
+            self.assertTrue(np.allclose(peak, sigproc.channel_peaks(runs[0])))
+
+    def test_000_t(self):
+        """Inline, thread and process pools"""
+
+        self.check("thread", 1)
+        self.check("thread", 3)
+        self.check("process", 2)
+
+    def test_001_t(self):
+        """Errors"""
+
+        with AnalysisExecutor("thread", 2) as executor:
+            executor.submit(sigproc.channel_peaks, self.sweep[0, 0])
+            executor.submit(fail, "bad job")
+            results = executor.results()
+            self.assertEqual(len(next(results)), 4)
+            self.assertRaises(ValueError, next, results)
+
+        self.assertRaises(ValueError, AnalysisExecutor, "fibre")
+
+    def test_002_t(self):
+        """Workers run single threaded FFTs"""
+
+        for kind in ("thread", "process"):
+            with AnalysisExecutor(kind, 2) as executor:
+                for job in xrange(4):
+                    executor.submit(fft_threads)
+                self.assertEqual(list(executor.results()), [1] * 4)
+
+    def test_003_t(self):
+        """Process pool captures go through shared memory"""
+
+        files = set(os.listdir(SHARED_DIR))
+
+        with AnalysisExecutor("process", 2) as executor:
+            for runs in self.sweep:
+                executor.submit(shared, runs)
+            self.assertEqual(list(executor.results()), [True] * len(self.sweep))
+
+            self.assertEqual(list(executor.map(shared, self.sweep)), [True] * len(self.sweep))
+
+        # Every capture is removed once its results are in.
+        self.assertEqual(set(os.listdir(SHARED_DIR)), files)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_analysis_executor)
@@ -30,7 +30,10 @@ from crimson_sink_s import crimson_sink_s
 
 import time
 import sigproc
-from MockCrimson import MockCrimson
+from AnalysisExecutor import AnalysisExecutor
+from mock_crimson_source_c import mock_crimson_source_c
+from mock_crimson_udp_source_c import mock_crimson_udp_source_c
+from mock_crimson_sink_s import mock_crimson_sink_s
 import numpy as np
 
 from log import log
@@ -71,6 +74,10 @@ class qa_crimson_loopback(gr_unittest.TestCase):
         # Flag to mock the vsnk or not
         self._TO_MOCK = False
 
+        # When mocking, receive the mock samples over UDP from a
+        # MockCrimsonServer instead of generating them in the flowgraph.
+        self._MOCK_LINK = False
+
         # Start with 4 channels. When central frequency cross 40 MHz
         # channels 3 and 4 must be disabled.
         self.channels = range(4)
@@ -78,6 +85,9 @@ class qa_crimson_loopback(gr_unittest.TestCase):
         # In seconds.
         self.test_time = 5.0
 
+        # In samples per second; 260e6 is the max.
+        self.sample_rate = 20e6
+
         # Extra white space for test seperation.
         print("")
 
@@ -120,7 +130,7 @@ class qa_crimson_loopback(gr_unittest.TestCase):
         tb = gr.top_block()
 
         # Variables.
-        sample_rate = 20e6 #260e6 is the max
+        sample_rate = self.sample_rate
         wave_freq = 1e6
 
         sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
@@ -143,45 +153,93 @@ class qa_crimson_loopback(gr_unittest.TestCase):
                 tb.connect(sigs[channel], c2ss[channel])
                 tb.connect(c2ss[channel], (csnk, channel))
 
-            # Blocks and Connections (RX CHAIN).
+            # Blocks (RX CHAIN).
             csrc = crimson_source_c(self.channels, sample_rate, centre_freq, rx_gain)
 
-            vsnk = [blocks.vector_sink_c()
-                for channel in self.channels]
-
-            for channel in self.channels:
-                tb.connect((csrc, channel), vsnk[channel])
-
-            # Reset TX and RX times to be roughly in sync.
+        else:
+            # The mock source stands in for the whole loopback; the mock TX
+            # chain only runs where its stats are checked (see txTest).
+            csnk = None
+            if self._MOCK_LINK:
+                csrc = mock_crimson_udp_source_c(self.channels, sample_rate, centre_freq, rx_gain)
+            else:
+                csrc = mock_crimson_source_c(self.channels, sample_rate, centre_freq, rx_gain, self.test_time)
+
+        # Connections (RX CHAIN).
+        vsnk = [blocks.vector_sink_c()
+            for channel in self.channels]
+
+        for channel in self.channels:
+            tb.connect((csrc, channel), vsnk[channel])
+
+        # Reset TX and RX times to be roughly in sync.
+        if csnk is not None:
             csnk.set_time_now(uhd.time_spec_t(0.0))
-            csrc.set_time_now(uhd.time_spec_t(0.0))
+        csrc.set_time_now(uhd.time_spec_t(0.0))
 
-            # Issue stream command to start RX chain somewhere in the middle of the test.
-            sc.stream_now = False
-            sc.time_spec = uhd.time_spec_t(self.test_time / 2.0)
-            csrc.issue_stream_cmd(sc)
+        # Issue stream command to start RX chain somewhere in the middle of the test.
+        sc.stream_now = False
+        sc.time_spec = uhd.time_spec_t(self.test_time / 2.0)
+        csrc.issue_stream_cmd(sc)
 
-            # Run the test.
+        # Run the test. The mock runs on a virtual clock and ends the
+        # flowgraph itself once the samples are delivered.
+        if not self._TO_MOCK:
             tb.start()
             time.sleep(self.test_time)
             tb.stop()
             tb.wait()
+        else:
+            tb.run()
 
-            # Return a vsnk sample for further processing and verification.
-            # vsnk are to be processed in individual unit tests, eg. def test_xyz_t(self):
-            # Read sigproc.py for further information on signal processing and vsnks.
+        # Return a vsnk sample for further processing and verification.
+        # vsnk are to be processed in individual unit tests, eg. def test_xyz_t(self):
+        # Read sigproc.py for further information on signal processing and vsnks.
 
-            return vsnk, csnk, csrc
+        return vsnk, csnk, csrc
 
-        else:
-            crimson = MockCrimson(len(self.channels), self.test_time, sc.num_samps, sample_rate)
-            #crimson.amp = tx_amp
-            crimson.freq = centre_freq
-            #print crimson.equation()
+    def txTest(self, channels, sample_rate, duration):
+        """
+        +--------+    +--------+    +------+
+        | sig[0] |--->| c2s[0] |--->|ch0   |
+        +--------+    +--------+    |      |
+           ...           ...        | csnk |
+        +--------+    +--------+    |      |
+        | sig[n] |--->| c2s[n] |--->|chn   |
+        +--------+    +--------+    +------+
+
+        Streams the TX chain into mock_crimson_sink_s for `duration`
+        seconds and returns the MockCrimsonSink stats.
+        """
+
+        tb = gr.top_block()
+
+        sigs = [
+            analog.sig_source_c(sample_rate, analog.GR_SIN_WAVE, 1e6, 3.0e4, 0.0)
+            for channel in channels]
 
-            vsnk = crimson.sample()
+        c2ss = [
+            blocks.complex_to_interleaved_short(True)
+            for channel in channels]
 
-            return vsnk, None, None # Match tuple
+        csnk = mock_crimson_sink_s(channels, sample_rate, 15e6, 0.0, payload_size=32768)
+
+        for index in xrange(len(channels)):
+            tb.connect(sigs[index], c2ss[index])
+            tb.connect(c2ss[index], (csnk, index))
+
+        csnk.set_time_now(uhd.time_spec_t(0.0))
+
+        tb.start()
+        time.sleep(duration)
+        tb.stop()
+        tb.wait()
+
+        # Let the sink read what is still queued before counting.
+        time.sleep(0.1)
+        csnk.mock.close()
+
+        return csnk.mock.stats()
     #-----------------------------------------------------------------------------------#
 
     #@unittest.skip("Skipping the debug check test")
@@ -204,30 +262,44 @@ class qa_crimson_loopback(gr_unittest.TestCase):
     def test_003_t(self):
         """Phase Coherency"""
 
-        for centre_freq in np.arange(15e6, 4e9, 25e6):
-            log.debug("%.2f Hz" % centre_freq)
+        freqs = np.arange(15e6, 4e9, 25e6)
+        num_channels = []
 
-            runs = []
+        # Analysis of one centre frequency runs while the next is acquired.
+        with AnalysisExecutor() as executor:
+            for centre_freq in freqs:
+                log.debug("%.2f Hz" % centre_freq)
 
-            # Run 3 iterations at each centre frequency
-            for x in xrange(3):
-                vsnk = self.coreTest(8.0, 3.0e4, centre_freq)[0]
-                #sigproc.dump(vsnk)
+                runs = []
+
+                # Run 3 iterations at each centre frequency
+                for x in xrange(3):
+                    vsnk = self.coreTest(8.0, 3.0e4, centre_freq)[0]
+                    #sigproc.dump(vsnk)
 
-                runs.append(vsnk)
+                    runs.append(vsnk)
 
-            for channel in xrange(len(runs[0])):
-                # Find phase shift of the channel between runs
+                # (runs x channels x samples)
+                runs = sigproc.stack(runs)
+
+                # Find phase shift of each channel between runs
                 # Format: phase_diff = [diff(0,1), diff(0,2)]
-                phase_diff = sigproc.phase_diff([row[channel] for row in runs])
-                log.debug(phase_diff)
+                for channel in xrange(runs.shape[1]):
+                    executor.submit(sigproc.phase_diff, runs[:, channel])
+                num_channels.append(runs.shape[1])
 
-                try:
-                    self.assertLessEqual(phase_diff[0] + phase_diff[1], np.pi/90.0, # Check less than 2 deg total
-                        "Channel {} out of phase at {:.0f}  MHz Centre Frequency".format(channel, centre_freq))
-                except AssertionError, e:
-                    self.failures.append(str(e))
-                    pass
+            results = executor.results()
+            for centre_freq, count in zip(freqs, num_channels):
+                for channel in xrange(count):
+                    phase_diff = next(results)
+                    log.debug(phase_diff)
+
+                    try:
+                        self.assertLessEqual(phase_diff[0] + phase_diff[1], np.pi/90.0, # Check less than 2 deg total
+                            "Channel {} out of phase at {:.0f}  MHz Centre Frequency".format(channel, centre_freq))
+                    except AssertionError, e:
+                        self.failures.append(str(e))
+                        pass
 
     def test_004_t(self):
         """Start of Burst"""
@@ -268,41 +340,64 @@ class qa_crimson_loopback(gr_unittest.TestCase):
         """Gain (LB + HB)"""
         # Checks using the areas of the waves and the peaks to verify (x2)
 
-        for centre_freq in np.arange(10e6, 4e9, 20e6):
+        freqs = np.arange(10e6, 4e9, 20e6)
 
-            log.debug("%.2f Hz" % centre_freq)
+        # Analysis of one centre frequency runs while the next is acquired.
+        with AnalysisExecutor() as executor:
+            for centre_freq in freqs:
 
-            areas = []
+                log.debug("%.2f Hz" % centre_freq)
 
-            # For each centre frequency, sweep the TX Gain.
-            for tx_amp in np.arange(5e3, 30e3, 5.0e3):
+                sweep = []
 
-                vsnk = self.coreTest(# High band requires stronger reception when centre_freq is greater 120 Mhz.
-                    30.0 if centre_freq > 120e6 else 10.0,
-                    tx_amp,
-                    centre_freq)[0]
+                # For each centre frequency, sweep the TX Gain.
+                for tx_amp in np.arange(5e3, 30e3, 5.0e3):
 
-                #sigproc.dump(vsnk)
+                    vsnk = self.coreTest(# High band requires stronger reception when centre_freq is greater 120 Mhz.
+                        30.0 if centre_freq > 120e6 else 10.0,
+                        tx_amp,
+                        centre_freq)[0]
 
-                area = sigproc.absolute_area(vsnk)
-                areas.append(area)
+                    #sigproc.dump(vsnk)
 
-            # Transpose to defragment channel data.
-            areas = np.array(areas).T.tolist()
+                    sweep.append(vsnk)
 
-            # Log
-            log.debug("Absolute Areas")
-            for ch, area in enumerate(areas):
-                log.debug("ch[%d]: %r" % (ch, np.around(area, decimals = 4)))
+                # Areas and RF figures of merit of the whole (tx_amp x channel x sample) sweep at once.
+                sweep = sigproc.stack(sweep)
+                executor.submit(sigproc.absolute_area, sweep)
+                executor.submit(sigproc.spectral_metrics, sweep, self.sample_rate)
 
-            # Verify areas are increasing (just check if list if sorted).
-            for area in areas:
-                try:
-                    self.assertEqual(area, sorted(area),
-                        "{:.0f} MHz central freqeuncy".format(centre_freq/1e6))
-                except AssertionError, e:
-                    self.failures.append(str(e))
-                    pass
+            results = executor.results()
+            for centre_freq in freqs:
+                areas = next(results)
+                metrics = next(results)
+
+                # Transpose to defragment channel data.
+                areas = areas.T
+
+                # Log
+                log.debug("Absolute Areas")
+                for ch, area in enumerate(areas):
+                    log.debug("ch[%d]: %r" % (ch, np.around(area, decimals = 4)))
+
+                # Verify areas are increasing (just check if list if sorted).
+                for area in areas:
+                    try:
+                        self.assertEqual(area.tolist(), sorted(area),
+                            "{:.0f} MHz central freqeuncy".format(centre_freq/1e6))
+                    except AssertionError, e:
+                        self.failures.append(str(e))
+                        pass
+
+                # Log only: 64 samples are too few for these to be checked,
+                # the lobes of DC, tone and harmonics overlap (see "overlap").
+                log.debug("SNR / SFDR / THD (dB)")
+                for ch in xrange(areas.shape[0]):
+                    log.debug("ch[%d]: %r / %r / %r%s" % (ch,
+                        np.around(metrics["snr"][:, ch], decimals = 1),
+                        np.around(metrics["sfdr"][:, ch], decimals = 1),
+                        np.around(metrics["thd"][:, ch], decimals = 1),
+                        " (overlapping lobes)" if np.any(metrics["overlap"][:, ch]) else ""))
 
     def test_007_t(self):
         """Channel Repeatability"""
@@ -340,13 +435,21 @@ class qa_crimson_loopback(gr_unittest.TestCase):
                 vsnk = self.coreTest(8.0, 3.0e4, centre_freq)[0]
 
                 #Convert to magnitude
-                vsnk = sigproc.to_mag(vsnk)
+                mags = sigproc.to_mag(vsnk)
+
+                #Per sample, as np.allclose(mags[0], mags[channel], 0.05, 0.05), for every channel at once
+                excess = np.max(np.absolute(mags[0] - mags) - 0.05 * np.absolute(mags), axis=-1)
+
+                #Only to report which pair of channels deviates the most
+                mag_error, phase_offset, xcorr, (a, b) = sigproc.channel_coherence(vsnk)
+                log.debug(mag_error)
 
                 #Check that the channels are all similar to each other
-                for channel in xrange(1, len(vsnk)):
+                for channel in xrange(1, len(mags)):
                     try:
-                        self.assertTrue(np.allclose(vsnk[0], vsnk[channel], 0.05, 0.05),
-                            "{:.0f} MHz Central Frequency".format(centre_freq/1e6))
+                        self.assertLessEqual(excess[channel], 0.05,
+                            "Ch {} at {:.0f} MHz Central Frequency (worst pair: ch {} and {})".format(
+                                channel, centre_freq/1e6, a, b))
                     except AssertionError, e:
                         self.failures.append(str(e))
                         pass
@@ -354,7 +457,31 @@ class qa_crimson_loopback(gr_unittest.TestCase):
     def test_009_t(self):
         """Flow Control"""
 
-        # NOTE: This test cannot be mocked.
+        if self._TO_MOCK:
+            # Highest rate each channel count streams without underflowing.
+            for count in (1, 2, 4):
+                channels = range(count)
+                sustained = 0.0
+
+                for sample_rate in (5e6, 10e6, 20e6, 40e6, 65e6, 130e6, 260e6):
+                    stats = self.txTest(channels, sample_rate, 1.0)
+                    log.debug("%d ch at %.0f MS/s: %r" % (count, sample_rate / 1e6, stats))
+
+                    if any(stats["underflows"]) or not all(stats["samples"]):
+                        break
+                    sustained = sample_rate
+
+                log.info("Max sustainable TX rate with %d ch: %.0f MS/s" % (count, sustained / 1e6))
+
+                # The loopback tests stream at self.sample_rate.
+                try:
+                    self.assertGreaterEqual(sustained, self.sample_rate,
+                        "TX chain cannot sustain {:.0f} MS/s on {} channels".format(self.sample_rate / 1e6, count))
+                except AssertionError, e:
+                    self.failures.append(str(e))
+                    pass
+
+            return
 
         cmd = "./python/crimson_test_underflow"
         p = Popen(cmd, stdout=PIPE, stderr=PIPE)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr_unittest
+
+from MockCrimson import MockCrimson
+from MockCrimsonChannel import MockCrimsonChannel
+from sc16 import from_sc16
+from MockCrimsonRingChannel import MockCrimsonRingChannel
+import numpy as np
+
+class qa_mock_crimson(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the mock generates the same waveform the scalar
+           x(t) = A*sin(2.0*pi*f*t) equation does, without hardware.
+    """
+
+    def setUp(self):
+        self.test_time = 5.0
+        self.sample_rate = 20e6
+
+    def tearDown(self):
+        pass
+
+    def test_000_t(self):
+        """Waveform matches the scalar equation"""
+
+        crimson = MockCrimson(1, self.test_time, 64, self.sample_rate)
+        crimson.freq = 15e6
+
+        data = crimson.sample()[0].data()
+
+        self.assertEqual(data.dtype, np.complex64)
+        self.assertTrue(data.flags.c_contiguous)
+        self.assertEqual(len(data), 64)
+
+        step = self.test_time / 2.0 / self.sample_rate
+        for n in xrange(len(data)):
+            t = self.test_time / 2.0 + n * step
+            expected = complex(np.sin(2.0 * np.pi * crimson.freq * t),
+                np.sin(2.0 * np.pi * crimson.freq * t + np.pi/2.0))
+            self.assertAlmostEqual(complex(data[n]), expected, places=5)
+
+    def test_001_t(self):
+        """Waveform is reproducible"""
+
+        crimson = MockCrimson(1, self.test_time, 1 << 20, self.sample_rate)
+        crimson.freq = 1e9
+
+        first = crimson.sample()[0].data()
+        second = crimson.sample()[0].data()
+
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+    def test_002_t(self):
+        """Channels are read-only views of one capture"""
+
+        crimson = MockCrimson(4, self.test_time, 128, self.sample_rate)
+        vsnk = crimson.sample()
+
+        self.assertEqual(crimson.capture.shape, (4, 128))
+        for channel in xrange(len(vsnk)):
+            self.assertTrue(np.shares_memory(vsnk[channel].data(), crimson.capture))
+            self.assertFalse(vsnk[channel].data().flags.writeable)
+            self.assertEqual(vsnk[channel].data().tobytes(), vsnk[0].data().tobytes())
+
+    def test_003_t(self):
+        """Streamed chunks join into the sampled capture"""
+
+        crimson = MockCrimson(2, self.test_time, 1000, self.sample_rate)
+        crimson.freq = 15e6
+
+        chunks = [chunk.copy() for chunk in crimson.stream(300)]
+
+        self.assertEqual([chunk.shape[1] for chunk in chunks], [300, 300, 300, 100])
+
+        crimson.sample()
+        self.assertEqual(np.concatenate(chunks, axis=1).tobytes(), crimson.capture.tobytes())
+
+    def test_004_t(self):
+        """Impairments are seeded per channel"""
+
+        crimson = MockCrimson(4, self.test_time, 4096, self.sample_rate)
+        crimson.freq = 15e6
+        crimson.set_impairments(snr=20.0, phase_offset=[0.0, 0.1, 0.2, 0.3],
+            freq_offset=1e3, dc_offset=0.01+0.01j, iq_gain=0.05, iq_phase=0.01,
+            jitter=1e-12, seed=7)
+
+        first = crimson.sample()
+        first = [first[channel].data() for channel in xrange(len(first))]
+        second = crimson.sample()
+
+        for channel in xrange(len(second)):
+            self.assertEqual(first[channel].tobytes(), second[channel].data().tobytes())
+
+        # Channels draw independent noise.
+        self.assertNotEqual(first[0].tobytes(), first[1].tobytes())
+
+    def test_005_t(self):
+        """AWGN matches the requested SNR"""
+
+        crimson = MockCrimson(2, self.test_time, 1 << 16, self.sample_rate)
+        crimson.freq = 15e6
+        crimson.sample()
+        clean = crimson.capture
+
+        crimson.set_impairments(snr=10.0)
+        crimson.sample()
+        noise = crimson.capture - clean
+
+        snr = 10.0 * np.log10(np.mean(np.abs(clean) ** 2) / np.mean(np.abs(noise) ** 2))
+        self.assertAlmostEqual(snr, 10.0, places=1)
+
+    def test_006_t(self):
+        """Parallel sweep matches the serial one"""
+
+        crimson = MockCrimson(4, self.test_time, 1024, self.sample_rate)
+        crimson.set_impairments(snr=20.0, jitter=1e-12, seed=3)
+
+        freqs = np.arange(15e6, 4e9, 1e9)
+        serial = crimson.sweep(freqs, 3, processes=1)
+        parallel = crimson.sweep(freqs, 3, processes=2)
+
+        self.assertEqual(serial.shape, (len(freqs), 3, 4, 1024))
+        self.assertEqual(serial.tobytes(), parallel.tobytes())
+
+        # Runs draw independent noise.
+        self.assertNotEqual(serial[0, 0].tobytes(), serial[0, 1].tobytes())
+
+    def test_007_t(self):
+        """Repeated configurations hit the capture cache"""
+
+        MockCrimson.cache_clear()
+
+        for run in xrange(10):
+            crimson = MockCrimson(4, self.test_time, 64, self.sample_rate)
+            crimson.freq = 15e6
+            crimson.sample()
+
+            if run == 0:
+                first = crimson.capture
+
+        info = MockCrimson.cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["entries"]), (9, 1, 1))
+        self.assertIs(crimson.capture, first)
+
+        # Any change of configuration misses.
+        crimson.set_impairments(seed=1)
+        crimson.sample()
+        self.assertEqual(MockCrimson.cache_info()["misses"], 2)
+
+        # The cache is bounded.
+        cache_limit = MockCrimson.cache_limit
+        try:
+            MockCrimson.cache_limit = first.nbytes
+            crimson.set_impairments(seed=2)
+            crimson.sample()
+            self.assertEqual(MockCrimson.cache_info()["entries"], 1)
+        finally:
+            MockCrimson.cache_limit = cache_limit
+            MockCrimson.cache_clear()
+
+    def test_008_t(self):
+        """Channels are array backed"""
+
+        capture = np.exp(1j * np.linspace(0, 2 * np.pi, 256)).astype(np.complex64) * 0.5
+        channel = MockCrimsonChannel(capture)
+
+        # No copy and no writes through the view.
+        self.assertTrue(np.shares_memory(channel.data(), capture))
+        self.assertFalse(channel.data().flags.writeable)
+
+        sc16 = channel.data_as("sc16")
+        self.assertEqual(sc16.dtype, np.int16)
+        self.assertEqual(len(sc16), 2 * len(capture))
+        self.assertTrue(np.allclose(from_sc16(sc16), capture, atol=1.0 / 32767))
+
+        # Lists are converted once.
+        channel.update_data([1 + 1j, 2 + 2j])
+        self.assertEqual(channel.data().dtype, np.complex64)
+
+    def test_009_t(self):
+        """Ring channel keeps the newest samples"""
+
+        channel = MockCrimsonRingChannel(100)
+        samples = np.arange(350).astype(np.complex64)
+
+        channel.append(samples[:30])
+        self.assertEqual(channel.data().tolist(), samples[:30].tolist())
+
+        for start in xrange(30, 350, 40):
+            channel.append(samples[start:start + 40])
+
+        self.assertEqual(channel.data().tolist(), samples[250:].tolist())
+        self.assertEqual(channel.snapshot(10).tolist(), samples[340:].tolist())
+        self.assertEqual((channel.samples_seen, channel.samples_dropped, channel.wrap_count), (350, 250, 3))
+
+        # Appends larger than the ring.
+        channel.append(np.arange(1000, 1250).astype(np.complex64))
+        self.assertEqual(channel.data().tolist(), range(1150, 1250))
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_mock_crimson)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr_unittest
+from gnuradio import uhd
+
+from MockCrimsonServer import MockCrimsonServer, MockCrimsonClient, MockCrimsonSink, HEADER, FLAG_END_OF_BURST
+from MockCrimson import MockCrimson
+from sc16 import to_sc16, from_sc16
+
+import socket
+import time
+import numpy as np
+
+class qa_mock_crimson_server(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the RX stand-in honours timed stream commands over
+           the loopback interface, without hardware.
+    """
+
+    def setUp(self):
+        self.channels = range(4)
+        self.sample_rate = 1e6
+
+        # Not an alias of DC, so every sample differs from its neighbours.
+        self.wave_freq = self.sample_rate / 7
+
+        self.server = MockCrimsonServer(len(self.channels), self.sample_rate, self.wave_freq)
+        self.server.start()
+
+        self.client = MockCrimsonClient(self.server.address, len(self.channels), self.sample_rate)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_000_t(self):
+        """Timed burst"""
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+        sc.num_samps = 4096
+        sc.stream_now = False
+        sc.time_spec = uhd.time_spec_t(0.25)
+
+        self.client.set_time_now(uhd.time_spec_t(0.0))
+
+        start = time.time()
+        self.client.issue_stream_cmd(sc)
+        vsnk = self.client.receive(sc.num_samps)
+
+        # Burst must not arrive before its time_spec.
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+        stats = self.client.stats()
+        for channel in self.channels:
+            self.assertEqual(len(vsnk[channel].data()), sc.num_samps)
+            self.assertEqual(stats["samples"][channel], sc.num_samps)
+            self.assertEqual(stats["dropped"][channel], 0)
+            self.assertTrue(np.any(vsnk[channel].data()))
+
+    def test_001_t(self):
+        """TX underflow accounting"""
+
+        sink = MockCrimsonSink(1, 1e6, buffer_size=1000)
+
+        # On time, then late (FIFO dry), then overfilling the FIFO.
+        sink.consume(0, 500, 0.0)
+        sink.consume(0, 500, 0.0004)
+        sink.consume(0, 500, 0.002)
+        sink.consume(0, 500, 0.0021)
+        sink.consume(0, 5000, 0.0021)
+
+        stats = sink.stats()
+        sink.close()
+
+        self.assertEqual(stats["samples"], [7000])
+        self.assertEqual(stats["late"], [1])
+        self.assertEqual(stats["underflows"], [1])
+        self.assertEqual(stats["dropped"], [4900])
+
+    def test_002_t(self):
+        """TX datagrams reach the sink"""
+
+        sink = MockCrimsonSink(len(self.channels), self.sample_rate)
+        sink.start()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for address in sink.addresses:
+            sock.sendto(np.zeros(512, dtype="<i2").tobytes(), address)
+
+        time.sleep(0.2)
+        stats = sink.stats()
+
+        sock.close()
+        sink.close()
+
+        self.assertEqual(stats["samples"], [256] * len(self.channels))
+
+    def test_003_t(self):
+        """Consecutive timed bursts stay phase continuous"""
+
+        num_samps = 3000
+        starts = (0.1, 0.1 + 5000 / self.sample_rate)
+
+        self.client.set_time_now(uhd.time_spec_t(0.0))
+
+        for start in starts:
+            sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+            sc.num_samps = num_samps
+            sc.stream_now = False
+            sc.time_spec = uhd.time_spec_t(start)
+            self.client.issue_stream_cmd(sc)
+
+        # Each burst is the wave from its own tick on, as sent over sc16.
+        crimson = MockCrimson(1, 2.0, 0, self.sample_rate)
+        crimson.freq = self.wave_freq
+        crimson.amp = 0.5
+
+        for start in starts:
+            vsnk = self.client.receive(num_samps)
+
+            tick = int(round(start * self.sample_rate))
+            expected = from_sc16(to_sc16(next(crimson.stream(num_samps, num_samps, tick)))[0])
+
+            for channel in self.channels:
+                self.assertComplexTuplesAlmostEqual(vsnk[channel].data(), expected, 4)
+
+    def test_004_t(self):
+        """Packets the server cannot send in time count as late"""
+
+        server = MockCrimsonServer(len(self.channels), 1e10)
+        server.start()
+        client = MockCrimsonClient(server.address, len(self.channels), 1e10)
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_START_CONTINUOUS)
+        sc.stream_now = True
+        client.issue_stream_cmd(sc)
+        client.drain(0.2)
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_STOP_CONTINUOUS)
+        client.issue_stream_cmd(sc)
+        client.close()
+        server.close()
+
+        self.assertGreater(server.packets_sent, 0)
+        self.assertGreater(server.packets_late, 0)
+
+    def test_005_t(self):
+        """A sender keeping pace with the TX clock never underflows"""
+
+        spp = 1000
+        sink = MockCrimsonSink(1, self.sample_rate, buffer_size=200 * spp, recv_buffer_size=1 << 20)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        payload = np.zeros(2 * spp, dtype="<i2").tobytes()
+
+        # One datagram per millisecond, each sent when due. The sink thread
+        # only starts 30 ms in, which must not make the first ones late; the
+        # 100 ms prefill leaves the sender room for scheduling hiccups.
+        start = time.time()
+        for packet in xrange(300):
+            if packet == 30:
+                sink.start()
+
+            delay = start + packet * spp / self.sample_rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            sock.sendto(payload, sink.addresses[0])
+
+        time.sleep(0.1)
+        stats = sink.stats()
+
+        sock.close()
+        sink.close()
+
+        self.assertEqual(stats["samples"], [300 * spp])
+        self.assertEqual(stats["underflows"], [0])
+        self.assertEqual(stats["dropped"], [0])
+        if sink.kernel_stamps:
+            self.assertGreater(stats["lag"][0], 0.01)
+
+    def send_packets(self, client, packets):
+        """Sends (channel, flags, sequence, tick, samples) packets to the client"""
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for channel, flags, seq, tick, samples in packets:
+            header = HEADER.pack(channel, flags, len(samples), seq, tick)
+            sock.sendto(header + to_sc16(samples).tobytes(), client.address)
+        sock.close()
+
+    def test_006_t(self):
+        """Packets lost from a burst read as zeros in place"""
+
+        client = MockCrimsonClient(self.server.address, 2, self.sample_rate)
+        data = np.arange(1, 9, dtype=np.complex64) / 10
+
+        # Channel 1 loses the burst's first packet.
+        self.send_packets(client, [
+            (0, 0, 0, 100, data[:4]),
+            (0, FLAG_END_OF_BURST, 1, 104, data[4:]),
+            (1, FLAG_END_OF_BURST, 1, 104, data[4:])])
+
+        vsnk = client.receive(8, 1.0)
+        stats = client.stats()
+        client.close()
+
+        self.assertComplexTuplesAlmostEqual(vsnk[0].data(), data, 4)
+        self.assertComplexTuplesAlmostEqual(vsnk[1].data(), np.concatenate((np.zeros(4), data[4:])), 4)
+        self.assertEqual(stats["dropped"], [0, 1])
+
+    def test_007_t(self):
+        """read() gets past packets lost at the end of a burst"""
+
+        client = MockCrimsonClient(self.server.address, 2, self.sample_rate)
+        data = np.arange(1, 9, dtype=np.complex64) / 10
+
+        # Channel 1 loses the burst's last packet, end of burst included.
+        self.send_packets(client, [
+            (0, 0, 0, 100, data[:4]),
+            (1, 0, 0, 100, data[:4]),
+            (0, FLAG_END_OF_BURST, 1, 104, data[4:])])
+
+        first, tick, end_of_burst = client.read(100, 0.1)
+        self.assertEqual((first.shape, tick, end_of_burst), ((2, 4), 100, False))
+
+        last, tick, end_of_burst = client.read(100, 0.1)
+        client.close()
+
+        self.assertEqual((last.shape, tick, end_of_burst), ((2, 4), 104, True))
+        self.assertComplexTuplesAlmostEqual(last[0], data[4:], 4)
+        self.assertComplexTuplesAlmostEqual(last[1], np.zeros(4), 4)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_mock_crimson_server)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr
+from gnuradio import gr_unittest
+from gnuradio import uhd
+from gnuradio import blocks
+from mock_crimson_source_c import mock_crimson_source_c
+from MockCrimson import MockCrimson
+
+import numpy as np
+import pmt
+import time
+
+class qa_mock_crimson_source_c(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the mock source delivers the MockCrimson capture through
+           a flowgraph, without hardware.
+    """
+
+    def setUp(self):
+        self.test_time = 5.0
+
+    def tearDown(self):
+        pass
+
+    def test_000_t(self):
+        tb = gr.top_block()
+
+        # Variables.
+        channels = range(4)
+        sample_rate = 20e6
+        center_freq = 15e6
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+        sc.num_samps = 100000
+
+        # Blocks.
+        csrc = mock_crimson_source_c(channels, sample_rate, center_freq, 1.0, self.test_time)
+
+        vsnk = [blocks.vector_sink_c() for channel in channels]
+
+        # Connections.
+        for channel in channels:
+            tb.connect((csrc, channel), vsnk[channel])
+
+        csrc.issue_stream_cmd(sc)
+
+        # The source ends the stream itself.
+        tb.run()
+
+        crimson = MockCrimson(len(channels), self.test_time, sc.num_samps, sample_rate)
+        crimson.freq = center_freq
+        crimson.sample()
+
+        for channel in channels:
+            self.assertComplexTuplesAlmostEqual(vsnk[channel].data(), crimson.capture[channel], 6)
+
+    def test_001_t(self):
+        """Timed stream command on the virtual clock"""
+
+        tb = gr.top_block()
+
+        channels = range(2)
+        sample_rate = 20e6
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+        sc.num_samps = 64
+        sc.stream_now = False
+        sc.time_spec = uhd.time_spec_t(self.test_time / 2.0)
+
+        csrc = mock_crimson_source_c(channels, sample_rate, 15e6, 1.0, self.test_time)
+        vsnk = [blocks.vector_sink_c() for channel in channels]
+
+        for channel in channels:
+            tb.connect((csrc, channel), vsnk[channel])
+
+        csrc.set_time_now(uhd.time_spec_t(0.0))
+        csrc.issue_stream_cmd(sc)
+
+        # Must not wait for the time_spec in wall-clock time.
+        start = time.time()
+        tb.run()
+        self.assertLess(time.time() - start, self.test_time / 2.0)
+
+        self.assertAlmostEqual(csrc.get_time_now().get_real_secs(),
+            self.test_time / 2.0 + sc.num_samps / sample_rate)
+
+        for channel in channels:
+            self.assertEqual(len(vsnk[channel].data()), sc.num_samps)
+
+            tags = vsnk[channel].tags()
+            self.assertEqual(len(tags), 1)
+            self.assertEqual(tags[0].offset, 0)
+            self.assertEqual(pmt.symbol_to_string(tags[0].key), "rx_time")
+
+            secs = pmt.to_uint64(pmt.tuple_ref(tags[0].value, 0)) + pmt.to_double(pmt.tuple_ref(tags[0].value, 1))
+            self.assertAlmostEqual(secs, self.test_time / 2.0)
+
+    def test_002_t(self):
+        """Consecutive timed bursts stay phase continuous"""
+
+        tb = gr.top_block()
+
+        channels = range(2)
+        sample_rate = 20e6
+        num_samps = 64
+        gap = 20000
+
+        csrc = mock_crimson_source_c(channels, sample_rate, 15e6, 1.0, self.test_time)
+        vsnk = [blocks.vector_sink_c() for channel in channels]
+
+        for channel in channels:
+            tb.connect((csrc, channel), vsnk[channel])
+
+        csrc.set_time_now(uhd.time_spec_t(0.0))
+
+        # Two bursts, the second one virtual millisecond after the first.
+        for start in (self.test_time / 2.0, self.test_time / 2.0 + gap / sample_rate):
+            sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+            sc.num_samps = num_samps
+            sc.stream_now = False
+            sc.time_spec = uhd.time_spec_t(start)
+            csrc.issue_stream_cmd(sc)
+
+        tb.run()
+
+        # Both bursts cut from one long capture starting at the first one's tick.
+        crimson = MockCrimson(len(channels), self.test_time, gap + num_samps, sample_rate)
+        crimson.freq = 15e6
+        capture = next(crimson.stream(gap + num_samps, start=int(round(self.test_time / 2.0 * sample_rate))))
+        expected = np.concatenate((capture[:, :num_samps], capture[:, gap:]), axis=-1)
+
+        for channel in channels:
+            self.assertComplexTuplesAlmostEqual(vsnk[channel].data(), expected[channel], 5)
+            self.assertEqual([tag.offset for tag in vsnk[channel].tags()], [0, num_samps])
+
+        self.assertAlmostEqual(csrc.get_time_now().get_real_secs(),
+            self.test_time / 2.0 + (gap + num_samps) / sample_rate)
+
+    def test_003_t(self):
+        """Repeated captures come from the MockCrimson cache"""
+
+        MockCrimson.cache_clear()
+
+        data = []
+        for run in xrange(3):
+            tb = gr.top_block()
+
+            csrc = mock_crimson_source_c(range(2), 20e6, 15e6, 1.0, self.test_time)
+            vsnk = [blocks.vector_sink_c() for channel in xrange(2)]
+            for channel in xrange(2):
+                tb.connect((csrc, channel), vsnk[channel])
+
+            sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+            sc.num_samps = 64
+            sc.stream_now = False
+            sc.time_spec = uhd.time_spec_t(self.test_time / 2.0)
+
+            csrc.set_time_now(uhd.time_spec_t(0.0))
+            csrc.issue_stream_cmd(sc)
+            tb.run()
+
+            data.append(vsnk[0].data())
+
+        info = MockCrimson.cache_info()
+        self.assertEqual((info["misses"], info["hits"]), (1, 2))
+        self.assertEqual(data[0], data[2])
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_mock_crimson_source_c)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr
+from gnuradio import gr_unittest
+from gnuradio import uhd
+from gnuradio import blocks
+from mock_crimson_udp_source_c import mock_crimson_udp_source_c
+from MockCrimsonServer import MockCrimsonServer
+from MockCrimson import MockCrimson
+from sc16 import to_sc16, from_sc16
+
+import numpy as np
+import pmt
+
+class qa_mock_crimson_udp_source_c(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the UDP mock source delivers MockCrimsonServer bursts
+           through a flowgraph, over the loopback interface.
+    """
+
+    def setUp(self):
+        self.channels = range(2)
+        # The MockCrimsonServer default 1 MHz wave is then not an alias of
+        # DC, so every sample differs from its neighbours.
+        self.sample_rate = 7e6
+
+        # The MockCrimsonServer default wave, as sent over sc16.
+        self.crimson = MockCrimson(1, 2.0, 0, self.sample_rate)
+        self.crimson.freq = 1e6
+        self.crimson.amp = 0.5
+
+    def tearDown(self):
+        pass
+
+    def expected(self, start, num_samps):
+        tick = int(round(start * self.sample_rate))
+        return from_sc16(to_sc16(next(self.crimson.stream(num_samps, num_samps, tick)))[0])
+
+    def run_bursts(self, csrc, starts, num_samps):
+        tb = gr.top_block()
+
+        vsnk = [blocks.vector_sink_c() for channel in self.channels]
+        for channel in self.channels:
+            tb.connect((csrc, channel), vsnk[channel])
+
+        csrc.set_time_now(uhd.time_spec_t(0.0))
+
+        for start in starts:
+            sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+            sc.num_samps = num_samps
+            sc.stream_now = False
+            sc.time_spec = uhd.time_spec_t(start)
+            csrc.issue_stream_cmd(sc)
+
+        # The source ends the stream itself.
+        tb.run()
+
+        return vsnk
+
+    def test_000_t(self):
+        """Timed burst from the block's own server"""
+
+        num_samps = 5000
+
+        csrc = mock_crimson_udp_source_c(self.channels, self.sample_rate, 15e6, 1.0)
+        vsnk = self.run_bursts(csrc, [0.5], num_samps)
+
+        expected = self.expected(0.5, num_samps)
+
+        for channel in self.channels:
+            self.assertComplexTuplesAlmostEqual(vsnk[channel].data(), expected, 4)
+
+            tags = vsnk[channel].tags()
+            self.assertEqual(len(tags), 1)
+            self.assertEqual(tags[0].offset, 0)
+            self.assertEqual(pmt.symbol_to_string(tags[0].key), "rx_time")
+
+            secs = pmt.to_uint64(pmt.tuple_ref(tags[0].value, 0)) + pmt.to_double(pmt.tuple_ref(tags[0].value, 1))
+            self.assertAlmostEqual(secs, 0.5)
+
+    def test_001_t(self):
+        """Consecutive bursts from an external server"""
+
+        num_samps = 3000
+        starts = (0.1, 0.1 + 5000 / self.sample_rate)
+
+        server = MockCrimsonServer(len(self.channels), self.sample_rate)
+        server.start()
+
+        csrc = mock_crimson_udp_source_c(self.channels, self.sample_rate, 15e6, 1.0, server.address)
+        vsnk = self.run_bursts(csrc, starts, num_samps)
+
+        server.close()
+
+        expected = np.concatenate([self.expected(start, num_samps) for start in starts])
+
+        for channel in self.channels:
+            self.assertComplexTuplesAlmostEqual(vsnk[channel].data(), expected, 4)
+            self.assertEqual([tag.offset for tag in vsnk[channel].tags()], [0, num_samps])
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_mock_crimson_udp_source_c)
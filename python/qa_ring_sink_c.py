@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr
+from gnuradio import gr_unittest
+from gnuradio import uhd
+from mock_crimson_source_c import mock_crimson_source_c
+from ring_sink_c import ring_sink_c
+from MockCrimson import MockCrimson
+
+import numpy as np
+
+class qa_ring_sink_c(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the ring sink keeps the newest samples of a flowgraph
+           running longer than its capacity.
+    """
+
+    def setUp(self):
+        self.test_time = 5.0
+
+    def tearDown(self):
+        pass
+
+    def test_000_t(self):
+        tb = gr.top_block()
+
+        # Variables.
+        channels = range(4)
+        sample_rate = 20e6
+        center_freq = 15e6
+        capacity = 3000
+
+        sc = uhd.stream_cmd_t(uhd.stream_cmd_t.STREAM_MODE_NUM_SAMPS_AND_DONE)
+        sc.num_samps = 100000
+
+        # Blocks.
+        csrc = mock_crimson_source_c(channels, sample_rate, center_freq, 1.0, self.test_time)
+
+        rsnk = [ring_sink_c(capacity) for channel in channels]
+
+        # Connections.
+        for channel in channels:
+            tb.connect((csrc, channel), rsnk[channel])
+
+        csrc.issue_stream_cmd(sc)
+
+        # The source ends the stream itself.
+        tb.run()
+
+        crimson = MockCrimson(len(channels), self.test_time, sc.num_samps, sample_rate)
+        crimson.freq = center_freq
+        crimson.sample()
+
+        for channel in channels:
+            expected = crimson.capture[channel]
+
+            self.assertComplexTuplesAlmostEqual(rsnk[channel].data(), expected[-capacity:], 6)
+            self.assertComplexTuplesAlmostEqual(rsnk[channel].snapshot(100), expected[-100:], 6)
+
+            ring = rsnk[channel].channel
+            self.assertEqual((ring.samples_seen, ring.samples_dropped, ring.wrap_count),
+                (sc.num_samps, sc.num_samps - capacity, sc.num_samps // capacity))
+
+        # A reset ring starts over.
+        rsnk[0].reset()
+        self.assertEqual(len(rsnk[0].data()), 0)
+        self.assertEqual(rsnk[0].channel.samples_seen, 0)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_ring_sink_c)
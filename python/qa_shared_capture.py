@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr_unittest
+
+from SharedCapture import SharedCapture
+from MockCrimson import MockCrimson
+
+import multiprocessing
+import os
+import numpy as np
+
+def peak(args):
+    """Worker: FFT peak of one channel of a shared capture"""
+    name, channel = args
+
+    capture = SharedCapture.attach(name)
+    data = capture.vsnk()[channel].data()
+
+    # Must be a view of the shared mapping, not a copy.
+    assert np.shares_memory(data, capture.array)
+
+    return float(np.max(np.abs(np.fft.fft(data))))
+
+class qa_shared_capture(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure worker processes see a capture by name, without copies.
+    """
+
+    def test_000_t(self):
+        crimson = MockCrimson(4, 5.0, 4096, 20e6)
+        crimson.freq = 15e6
+        vsnk = crimson.sample()
+
+        with SharedCapture.from_vsnk(vsnk) as capture:
+            self.assertEqual(capture.shape, (4, 4096))
+
+            pool = multiprocessing.Pool(2)
+            try:
+                peaks = pool.map(peak, [(capture.name, channel) for channel in xrange(4)])
+            finally:
+                pool.close()
+                pool.join()
+
+            for channel in xrange(4):
+                self.assertAlmostEqual(peaks[channel],
+                    np.max(np.abs(np.fft.fft(vsnk[channel].data()))), places=2)
+
+            path = SharedCapture.path(capture.name)
+
+        # The creator removes the capture.
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_shared_capture)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+from gnuradio import gr_unittest
+
+from MockCrimson import MockCrimson
+import sigproc
+
+import multiprocessing.pool
+import numpy as np
+from StringIO import StringIO
+
+class qa_sigproc(gr_unittest.TestCase):
+    """
+    Automatic Testing Procedure:
+        1. Ensure the signal processing routines give the expected results
+           on mock captures, without hardware.
+    """
+
+    def setUp(self):
+        self.sample_rate = 20e6
+
+        # Channels with distinct, bin centred tones so per-channel results differ.
+        self.num_samples = 4096
+        n = np.arange(self.num_samples)
+        self.tones = [k * self.sample_rate / self.num_samples for k in (200, 400, -600, 900)]
+        self.capture = np.array([
+            (channel + 1) * np.exp(2j * np.pi * tone / self.sample_rate * n)
+            for channel, tone in enumerate(self.tones)]).astype(np.complex64)
+
+        crimson = MockCrimson(4, 5.0, self.num_samples, self.sample_rate)
+        crimson.freq = 15e6
+        crimson.set_impairments(snr=30.0, phase_offset=[0.0, 0.1, 0.2, 0.3], seed=1)
+        self.vsnk = crimson.sample()
+
+    def tearDown(self):
+        pass
+
+    def test_000_t(self):
+        """Spectral peaks"""
+
+        peaks, bins, freqs = sigproc.spectral_peaks(self.capture, self.sample_rate)
+
+        for channel, tone in enumerate(self.tones):
+            self.assertAlmostEqual(peaks[channel], (channel + 1) * self.num_samples, delta=1.0)
+            self.assertAlmostEqual(freqs[channel], tone, delta=self.sample_rate / self.num_samples)
+            self.assertEqual(bins[channel], int(round(tone / self.sample_rate * self.num_samples)) % self.num_samples)
+
+        # Same peaks as one FFT per channel.
+        expected = [max(abs(freq) for freq in np.fft.fft(self.vsnk[channel].data()))
+            for channel in xrange(len(self.vsnk))]
+        self.assertTrue(np.allclose(sigproc.channel_peaks(self.vsnk), expected))
+
+    def test_001_t(self):
+        """Magnitude"""
+
+        expected = [[np.sqrt(datum.real*datum.real + datum.imag*datum.imag) for datum in self.vsnk[channel].data()]
+            for channel in xrange(len(self.vsnk))]
+
+        mags = sigproc.to_mag(self.vsnk)
+        self.assertEqual(mags.shape, (4, self.num_samples))
+        self.assertTrue(np.allclose(mags, expected))
+
+        # Output buffer reuse.
+        out = np.empty((4, self.num_samples), dtype=np.float32)
+        mags = sigproc.to_mag(self.vsnk, out=out)
+        self.assertIs(mags, out)
+        self.assertTrue(np.allclose(out, expected))
+
+    def test_002_t(self):
+        """Text dump"""
+
+        vsnk = self.vsnk[:2]
+
+        expected = ""
+        for sample in xrange(0, 100, 3):
+            for channel in xrange(len(vsnk)):
+                datum = vsnk[channel].data()[sample]
+                expected += "%10.5f %10.5f\t" % (datum.real, datum.imag)
+            expected += "\n"
+        expected += "\n"
+
+        stream = StringIO()
+        sigproc.dump(vsnk, stream, decimation=3, head=34)
+        self.assertEqual(stream.getvalue(), expected)
+
+    def test_003_t(self):
+        """Binary dump"""
+
+        # Keep within sc16 full scale.
+        capture = self.capture / 4.0
+
+        for fmt, dtype, scale in (("sc16", "<i2", 32767.0), ("fc32", "<f4", 1.0)):
+            stream = StringIO()
+            sigproc.dump(capture, stream, fmt=fmt, tail=1000)
+            raw = stream.getvalue()
+
+            magic, version, code, channels, decimation, samples = sigproc.DUMP_HEADER.unpack_from(raw)
+            self.assertEqual((magic, channels, decimation, samples), (sigproc.DUMP_MAGIC, 4, 1, 1000))
+
+            iq = np.frombuffer(raw, dtype=dtype, offset=sigproc.DUMP_HEADER.size) / scale
+            data = iq.astype(np.float32).view(np.complex64).reshape(4, 1000)
+            self.assertTrue(np.allclose(data, capture[:, -1000:], atol=1e-4))
+
+    def test_004_t(self):
+        """Phase differences between runs"""
+
+        runs = []
+        for seed in xrange(5):
+            crimson = MockCrimson(1, 5.0, self.num_samples, self.sample_rate)
+            crimson.freq = 15e6
+            crimson.set_impairments(snr=20.0, phase_offset=0.01 * seed, seed=seed)
+            runs.append(crimson.sample()[0])
+
+        # Reference: one run at a time against the first.
+        expected = []
+        for run in xrange(1, len(runs)):
+            phi = np.arcsin(np.dot(runs[0].data(), runs[run].data()) /
+                (np.linalg.norm(runs[0].data()) * np.linalg.norm(runs[run].data())))
+            expected.append(abs(phi))
+
+        self.assertTrue(np.allclose(sigproc.phase_diff(runs), expected, atol=1e-5))
+
+        pairs = sigproc.phase_diff(runs, all_pairs=True)
+        self.assertEqual(pairs.shape, (5, 5))
+        self.assertTrue(np.allclose(pairs[0, 1:], expected, atol=1e-5))
+        self.assertTrue(np.allclose(pairs, pairs.T))
+
+    def test_005_t(self):
+        """Absolute areas"""
+
+        expected = [abs(np.trapz(np.absolute(self.vsnk[channel].data())))
+            for channel in xrange(len(self.vsnk))]
+
+        self.assertTrue(np.allclose(sigproc.absolute_area(self.vsnk), expected))
+
+        # A sweep of (points x channels x samples).
+        sweep = [[self.vsnk[channel] for channel in xrange(len(self.vsnk))], self.capture]
+        areas = sigproc.absolute_area(sweep)
+        self.assertEqual(areas.shape, (2, 4))
+        self.assertTrue(np.allclose(areas[0], expected))
+        self.assertTrue(np.allclose(areas[1], sigproc.absolute_area(self.capture)))
+
+    def test_006_t(self):
+        """FFT plan and window cache"""
+
+        sigproc.fft_cache_clear()
+
+        with_plans = sigproc.pyfftw is not None
+        row_bytes = 2 * self.num_samples * np.dtype(np.complex64).itemsize
+
+        spectrum = sigproc.fft(self.capture)
+        self.assertTrue(np.allclose(spectrum, np.fft.fft(self.capture, axis=-1), atol=1e-2))
+
+        # Four rows take a plan of four rows, whatever the axis.
+        self.assertTrue(np.allclose(sigproc.fft(self.capture.T, axis=0), spectrum.T, atol=1e-2))
+        self.assertEqual(sigproc.fft_cache_info()["misses"], 1 if with_plans else 0)
+        self.assertEqual(sigproc.fft_cache_info()["plan_bytes"], 4 * row_bytes if with_plans else 0)
+
+        # 40 rows run as FFT_BATCH row batches and a plan for the rest.
+        batches = np.tile(self.capture, (10, 1, 1))
+        self.assertTrue(np.allclose(sigproc.fft(batches), np.fft.fft(batches), atol=1e-2))
+        self.assertEqual(sigproc.fft_cache_info()["plans"], 3 if with_plans else 0)
+
+        # Plans are kept within FFT_PLAN_BYTES, shrinking batches to fit.
+        limit = sigproc.FFT_PLAN_BYTES
+        sigproc.FFT_PLAN_BYTES = 3 * row_bytes
+        try:
+            self.assertTrue(np.allclose(sigproc.fft(batches), np.fft.fft(batches), atol=1e-2))
+            self.assertLessEqual(sigproc.fft_cache_info()["plan_bytes"], sigproc.FFT_PLAN_BYTES)
+        finally:
+            sigproc.FFT_PLAN_BYTES = limit
+
+        # Concurrent callers do not share plan buffers.
+        pool = multiprocessing.pool.ThreadPool(4)
+        try:
+            scaled = [self.capture * scale for scale in xrange(1, 17)]
+            for data, result in zip(scaled, pool.map(sigproc.fft, scaled)):
+                self.assertTrue(np.allclose(result, np.fft.fft(data), atol=1e-1))
+        finally:
+            pool.close()
+            pool.join()
+
+        win = sigproc.window(self.num_samples)
+        self.assertTrue(np.allclose(win, np.hanning(self.num_samples + 1)[:-1]))
+        self.assertFalse(win.flags.writeable)
+        self.assertTrue(sigproc.window(self.num_samples) is win)
+        self.assertFalse(sigproc.window(self.num_samples, ("kaiser", 8.0)) is win)
+
+        info = sigproc.fft_cache_info()
+        self.assertTrue(info["hits"] >= 1)
+
+        # Bounded in size.
+        for length in xrange(sigproc.FFT_CACHE_SIZE + 8):
+            sigproc.window(length + 1)
+        self.assertEqual(sigproc.fft_cache_info()["entries"], sigproc.FFT_CACHE_SIZE)
+
+        sigproc.fft_cache_clear()
+        self.assertEqual(sigproc.fft_cache_info()["entries"], 0)
+
+    def test_007_t(self):
+        """Streaming metrics"""
+
+        import scipy.signal
+
+        capture = sigproc.stack(self.vsnk)
+        metrics = [sigproc.RunningPeak(), sigproc.RunningArea(), sigproc.RunningPower(),
+            sigproc.RunningPhase(), sigproc.WelchPSD(256, self.sample_rate)]
+
+        # Uneven chunks, including an empty one and one shorter than a segment.
+        for start, stop in [(0, 1000), (1000, 1000), (1000, 1100), (1100, 3000), (3000, self.num_samples)]:
+            for metric in metrics:
+                metric.update(capture[:, start:stop])
+
+        peak, area, power, phase, psd = metrics
+        self.assertTrue(all(metric.samples == self.num_samples for metric in metrics))
+
+        mods = np.absolute(capture)
+        self.assertTrue(np.allclose(peak.result(), mods.max(axis=-1)))
+        self.assertEqual(peak.index.tolist(), np.argmax(mods, axis=-1).tolist())
+
+        self.assertTrue(np.allclose(area.result(), sigproc.absolute_area(capture)))
+        self.assertTrue(np.allclose(power.result(), np.mean(mods ** 2, axis=-1)))
+
+        expected = np.angle(np.dot(capture.astype(np.complex128), np.conj(capture[0].astype(np.complex128))))
+        self.assertTrue(np.allclose(phase.result(), expected))
+        self.assertTrue(np.allclose(phase.result(), [0.0, 0.1, 0.2, 0.3], atol=0.05))
+
+        freqs, expected = scipy.signal.welch(capture, self.sample_rate, nperseg=256,
+            return_onesided=False, detrend=False)
+        self.assertTrue(np.allclose(psd.result()[0], freqs))
+        self.assertTrue(np.allclose(psd.result()[1], expected, rtol=1e-4))
+
+        # Chunks straight from a stream.
+        crimson = MockCrimson(4, 5.0, 0, self.sample_rate)
+        power = sigproc.RunningPower()
+        for chunk in crimson.stream(1000, self.num_samples):
+            power.update(chunk)
+        self.assertEqual(power.samples, self.num_samples)
+
+    def test_008_t(self):
+        """Channel coherence"""
+
+        capture = sigproc.stack(self.vsnk).astype(np.complex128)
+        mag_error, phase_offset, xcorr, worst = sigproc.channel_coherence(self.vsnk)
+
+        for matrix in (mag_error, phase_offset, xcorr):
+            self.assertEqual(matrix.shape, (4, 4))
+
+        mags = np.absolute(capture)
+        for i in xrange(4):
+            for j in xrange(4):
+                self.assertAlmostEqual(mag_error[i, j], np.sqrt(np.mean((mags[i] - mags[j]) ** 2)), 5)
+
+        self.assertTrue(np.allclose(np.diag(mag_error), 0.0, atol=1e-6))
+        self.assertTrue(np.allclose(np.diag(xcorr), 1.0))
+        self.assertTrue(np.allclose(phase_offset, -phase_offset.T))
+        self.assertTrue(np.allclose(phase_offset[:, 0], [0.0, 0.1, 0.2, 0.3], atol=0.05))
+
+        # A channel at half amplitude stands out.
+        capture[2] *= 0.5
+        mag_error, phase_offset, xcorr, worst = sigproc.channel_coherence(capture)
+        self.assertTrue(2 in worst)
+        self.assertTrue(np.all(xcorr <= 1.0 + 1e-9))
+
+    def test_009_t(self):
+        """Inter-channel delays"""
+
+        # Band limited noise delayed by a fraction of a sample per channel.
+        rng = np.random.RandomState(1)
+        n = 1 << 16
+        spectrum = np.fft.fft(rng.randn(n) + 1j * rng.randn(n))
+        spectrum[np.absolute(np.fft.fftfreq(n)) > 0.2] = 0.0
+
+        delays = np.array([0.0, 2.25, -7.5, 40.4])
+        ramp = np.exp(-2j * np.pi * np.outer(delays, np.fft.fftfreq(n)))
+        capture = np.fft.ifft(spectrum * ramp, axis=-1).astype(np.complex64)
+
+        samples, seconds = sigproc.channel_delays(capture, self.sample_rate)
+        self.assertTrue(np.allclose(samples, delays, atol=0.1))
+        self.assertTrue(np.allclose(seconds, samples / self.sample_rate))
+
+        samples, seconds = sigproc.channel_delays(capture, reference=3)
+        self.assertTrue(np.allclose(samples, delays - delays[3], atol=0.1))
+
+    def test_010_t(self):
+        """SNR, SFDR, THD and spurs"""
+
+        rng = np.random.RandomState(1)
+        n = np.arange(self.num_samples)
+        tone = self.tones[0] + 1e3
+
+        # Tone, third harmonic at -40 dBc, a spur at -60 dBc and noise 50 dB down.
+        capture = (np.exp(2j * np.pi * tone / self.sample_rate * n)
+            + 1e-2 * np.exp(2j * np.pi * 3 * tone / self.sample_rate * n)
+            + 1e-3 * np.exp(2j * np.pi * -3e6 / self.sample_rate * n))
+        noise = 10 ** (-50 / 20.0) * (rng.randn(2, self.num_samples) + 1j * rng.randn(2, self.num_samples)) / np.sqrt(2)
+        capture = (capture + noise).astype(np.complex64)
+
+        metrics = sigproc.spectral_metrics(capture, self.sample_rate)
+
+        self.assertTrue(np.allclose(metrics["freq"], tone, atol=self.sample_rate / self.num_samples))
+        self.assertTrue(np.allclose(metrics["snr"], 50.0, atol=1.0))
+        self.assertTrue(np.allclose(metrics["thd"], -40.0, atol=0.5))
+        self.assertTrue(np.allclose(metrics["sfdr"], 40.0, atol=1.5))
+        self.assertTrue(np.all(metrics["noise_floor"] < -80.0))
+        self.assertFalse(np.any(metrics["overlap"]))
+
+        for spurs in metrics["spurs"]:
+            self.assertEqual(len(spurs), 2)
+            self.assertAlmostEqual(spurs[0][0], 3 * tone, delta=self.sample_rate / self.num_samples)
+            self.assertAlmostEqual(spurs[1][0], -3e6, delta=self.sample_rate / self.num_samples)
+
+        # A whole (points x channels x samples) sweep at once.
+        sweep = sigproc.spectral_metrics([capture, capture], self.sample_rate)
+        self.assertEqual(sweep["snr"].shape, (2, 2))
+        self.assertEqual(sweep["spurs"].shape, (2, 2))
+        self.assertTrue(np.allclose(sweep["snr"][1], metrics["snr"]))
+
+        # The mock's own impairments.
+        metrics = sigproc.spectral_metrics(self.vsnk, self.sample_rate)
+        self.assertTrue(np.allclose(metrics["snr"], 30.0, atol=1.5))
+
+        # A 1 MHz tone in 64 samples at 20 MS/s: its lobe takes in DC and
+        # its harmonics' lobes take in its own. Neither counts twice.
+        tone = np.exp(2j * np.pi * 1e6 / self.sample_rate * np.arange(64)).astype(np.complex64)
+        short = sigproc.spectral_metrics([tone, tone + 0.5], self.sample_rate)
+
+        self.assertTrue(np.all(short["overlap"]))
+        self.assertTrue(np.all(short["thd"] < -60.0))
+        self.assertAlmostEqual(short["snr"][0], short["snr"][1], delta=0.01)
+
+    def test_011_t(self):
+        """Decimation"""
+
+        sample_rate = 260e6
+        n = np.arange(1 << 16)
+
+        # The 1 MHz test tone and an out of band tone at 40 MHz, offset by 5 MHz.
+        capture = np.array([
+            np.exp(2j * np.pi * 6e6 / sample_rate * n) + np.exp(2j * np.pi * 45e6 / sample_rate * n),
+            0.5 * np.exp(2j * np.pi * 6e6 / sample_rate * n)]).astype(np.complex64)
+
+        sigproc.fft_cache_clear()
+        decimated, rate = sigproc.decimate(capture, sample_rate, 4e6, offset=5e6)
+
+        factor = int(round(sample_rate / rate))
+        self.assertEqual(factor, 44)
+        self.assertEqual(decimated.shape, (2, len(n) // factor))
+        self.assertEqual(decimated.dtype, np.complex64)
+
+        # In band tone kept at its level; out of band tone filtered away.
+        expected = np.exp(2j * np.pi * 1e6 / sample_rate * n[::factor][:decimated.shape[-1]])
+        self.assertTrue(np.allclose(decimated[0, 16:-16], expected[16:-16], atol=1e-3))
+        self.assertTrue(np.allclose(decimated[1, 16:-16], 0.5 * expected[16:-16], atol=1e-3))
+
+        peaks, bins, freqs = sigproc.spectral_peaks(decimated, rate)
+        self.assertTrue(np.allclose(freqs, 1e6, atol=rate / decimated.shape[-1]))
+
+        # Flat to the band edge, aliases into the band suppressed.
+        for freq, gain in ((1.9e6, 1.0), (-2e6, 1.0), (rate - 1.5e6, 0.0)):
+            tone = np.exp(2j * np.pi * freq / sample_rate * n).astype(np.complex64)
+            level = np.absolute(sigproc.decimate(tone, sample_rate, 4e6)[0][16:-16])
+            self.assertTrue(np.allclose(level, gain, atol=1e-3))
+
+        # Taps are designed once per rate.
+        sigproc.decimate(capture, sample_rate, 4e6)
+        edge = 4e6 / 2.0 / sample_rate
+        self.assertTrue(sigproc.lowpass(factor, edge) is sigproc.lowpass(factor, edge))
+        info = sigproc.fft_cache_info()
+        self.assertEqual(info["misses"], info["entries"] + info["plans"])
+
+        # An odd taps_per_phase would shift the output by half a sample.
+        self.assertRaises(ValueError, sigproc.decimate, capture, sample_rate, 4e6, taps_per_phase=15)
+
+        # Nothing to gain: passed through.
+        same, rate = sigproc.decimate(capture, sample_rate, sample_rate)
+        self.assertEqual(rate, sample_rate)
+        self.assertTrue(same is capture)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_sigproc)
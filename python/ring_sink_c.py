@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+import numpy as np
+from gnuradio import gr
+
+from MockCrimsonRingChannel import MockCrimsonRingChannel
+
+class ring_sink_c(gr.sync_block):
+    """
+    Complex sink keeping only the last `capacity` samples, in place of
+    blocks.vector_sink_c for long running captures.
+
+    data() and snapshot() may be called while the flowgraph runs.
+    """
+
+    def __init__(self, capacity):
+        gr.sync_block.__init__(self,
+            name="ring_sink_c",
+            in_sig=[np.complex64],
+            out_sig=None)
+
+        self.channel = MockCrimsonRingChannel(capacity)
+
+    def work(self, input_items, output_items):
+        self.channel.append(input_items[0])
+        return len(input_items[0])
+
+    def data(self):
+        return self.channel.data()
+
+    def snapshot(self, num_samples=None):
+        return self.channel.snapshot(num_samples)
+
+    def reset(self):
+        self.channel.reset()
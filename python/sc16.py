@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Per Vices Corporation.
+#
+# This is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+"""
+Conversions between complex64 samples and sc16, the interleaved 16 bit
+I/Q format of the Crimson's sample stream.
+"""
+
+import numpy as np
+
+SC16_SCALE = 32767.0
+
+def to_sc16(data, scale=SC16_SCALE):
+    """
+    Converts a complex64 array into interleaved I/Q shorts, clipping at
+    full scale.
+    """
+
+    iq = np.ascontiguousarray(data, dtype=np.complex64).view(np.float32)
+    return np.clip(np.rint(iq * scale), -32768, 32767).astype("<i2")
+
+def from_sc16(payload, scale=SC16_SCALE):
+    """
+    Converts interleaved I/Q shorts (bytes or array) into complex64.
+    """
+
+    if not isinstance(payload, np.ndarray):
+        payload = np.frombuffer(payload, dtype="<i2")
+
+    iq = payload.astype(np.float32)
+    iq /= scale
+    return iq.view(np.complex64)
@@ -57,94 +57,775 @@ Each channel column holds a complex number sample.
 
 """
 
+import multiprocessing
+import struct
 import sys
+import threading
+from collections import OrderedDict
+
 import numpy as np
+import scipy.signal
 
-def channel_peaks(vsnk):
+from sc16 import to_sc16
+
+# Multi-threaded FFTs when pyFFTW is around.
+try:
+    import pyfftw
+    import pyfftw.builders
+except ImportError:
+    pyfftw = None
+
+FFT_THREADS = multiprocessing.cpu_count()
+
+# Most rows transformed per plan execution. Plans are made per number of
+# rows and length, whatever the shape of the array transformed.
+FFT_BATCH = 16
+
+# Bytes of plan arrays each thread keeps. Least recently used plans beyond
+# it are dropped, and batches shrink so that a single plan fits.
+FFT_PLAN_BYTES = 256 << 20
+
+# FFT plans and windows kept, least recently used first. Windows are
+# shared; plans write into their own arrays, so every thread has its own.
+FFT_CACHE_SIZE = 32
+_fft_cache = OrderedDict()
+_fft_stats = {"hits": 0, "misses": 0}
+_fft_lock = threading.Lock()
+_fft_local = threading.local()
+
+def _plans():
+    """The calling thread's plan cache"""
+    if not hasattr(_fft_local, "plans"):
+        _fft_local.plans = OrderedDict()
+    return _fft_local.plans
+
+
+def _plan_bytes(plan):
+    return plan.input_array.nbytes + plan.output_array.nbytes
+
+
+def _plan(rows, length, dtype, threads):
+    """The calling thread's plan for `rows` FFTs of `length`, within FFT_PLAN_BYTES"""
+
+    def make():
+        template = pyfftw.empty_aligned((rows, length), dtype=dtype)
+        return pyfftw.builders.fft(template, axis=-1, threads=threads, planner_effort="FFTW_MEASURE")
+
+    plans = _plans()
+    plan = _cached(("fft", rows, length, np.dtype(dtype).str, threads), make, plans)
+
+    size = sum(_plan_bytes(entry) for entry in plans.itervalues())
+    while size > FFT_PLAN_BYTES and len(plans) > 1:
+        size -= _plan_bytes(plans.popitem(last=False)[1])
+
+    return plan
+
+
+def _cached(key, make, cache=None):
+    """Returns the cache entry for key, making it on a miss"""
+    if cache is None:
+        cache = _fft_cache
+
+    with _fft_lock:
+        entry = cache.pop(key, None)
+        if entry is None:
+            _fft_stats["misses"] += 1
+        else:
+            _fft_stats["hits"] += 1
+
+    if entry is None:
+        entry = make()
+
+    with _fft_lock:
+        cache[key] = entry
+        while len(cache) > FFT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    return entry
+
+
+def fft_cache_info():
     """
-    Returns one modulous peak per channel for a vsnk.
+    Returns the hits, misses and entries of the FFT plan and window cache,
+    the plans held by the calling thread and the bytes of their arrays, and
+    the FFT backend in use.
+    """
+
+    return {
+        "hits": _fft_stats["hits"],
+        "misses": _fft_stats["misses"],
+        "entries": len(_fft_cache),
+        "plans": len(_plans()),
+        "plan_bytes": sum(_plan_bytes(plan) for plan in _plans().itervalues()),
+        "backend": "pyfftw" if pyfftw is not None else "numpy",
+    }
+
+
+def fft_cache_clear():
+    """Empties the window cache and the calling thread's plans"""
+    with _fft_lock:
+        _fft_cache.clear()
+        _fft_stats["hits"] = 0
+        _fft_stats["misses"] = 0
+    _plans().clear()
+
+
+def set_fft_threads(threads):
+    """
+    Sets the threads of FFTs run from the calling thread (default
+    FFT_THREADS). Pool workers use 1 so they do not oversubscribe the cores.
+    """
+    _fft_local.threads = threads
+
+
+def window(length, kind="hann", dtype=np.float64):
+    """
+    Returns a cached, read-only periodic window of `length` samples. `kind`
+    is anything scipy.signal.get_window accepts, eg. "hann" or ("kaiser", 8.0).
+    """
+
+    def make():
+        win = scipy.signal.get_window(kind, length).astype(dtype)
+        win.setflags(write=False)
+        return win
+
+    return _cached(("window", length, np.dtype(dtype).str, kind), make)
+
+
+def fft(capture, axis=-1):
     """
+    FFT of an array along `axis`. With pyFFTW the rows are transformed
+    up to FFT_BATCH at a time by plans cached per (rows, length, dtype),
+    running on FFT_THREADS threads (see set_fft_threads).
+    """
+
+    capture = np.asarray(capture)
+
+    if pyfftw is None:
+        return np.fft.fft(capture, axis=axis)
+
+    rows = np.moveaxis(capture, axis, -1)
+    shape, length = rows.shape, rows.shape[-1]
+    rows = rows.reshape(-1, length)
+    dtype = np.result_type(capture.dtype, np.complex64)
+    threads = getattr(_fft_local, "threads", FFT_THREADS)
+
+    # No more rows than there are, and no more than a plan holding
+    # FFT_PLAN_BYTES of input and output can take. The rows left over
+    # get a plan of their own.
+    fit = FFT_PLAN_BYTES // (2 * max(length, 1) * np.dtype(dtype).itemsize)
+    batch = max(1, min(FFT_BATCH, len(rows), fit))
 
-    peaks = []
-    for channel in xrange(len(vsnk)):
-        freqs = np.fft.fft(vsnk[channel].data())
+    spectra = np.empty(rows.shape, dtype=dtype)
+    for start in xrange(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        plan = _plan(len(chunk), length, dtype, threads)
 
-        # Frequencies are complex. Make them modulous.
-        mods = [abs(freq) for freq in freqs]
+        plan.input_array[:] = chunk
 
-        peaks.append(max(mods))
+        # The plan owns its output array; copy out of it.
+        spectra[start:start + len(chunk)] = plan()
 
-    return peaks
+    return np.moveaxis(spectra.reshape(shape), -1, axis)
 
 
-def absolute_area(vsnk):
+# Kaiser window beta of the decimation filters, about 80 dB of stopband.
+LOWPASS_BETA = 8.0
+
+def _transition(num_taps):
+    """Transition width, in sample rates, of a num_taps LOWPASS_BETA low pass"""
+    attenuation = LOWPASS_BETA / 0.1102 + 8.7
+    return (attenuation - 7.95) / (2.285 * 2.0 * np.pi * (num_taps - 1))
+
+
+def lowpass(factor, passband, taps_per_phase=16):
     """
-    Returns the aboslute area of a vsnk as the modulous of the complex number.
+    Returns cached, read-only anti-aliasing taps for decimating by
+    `factor`: taps_per_phase * factor + 1 of them, Kaiser windowed, flat up
+    to `passband` (in input sample rates) and cut off half a transition
+    band above it.
     """
 
-    areas = []
-    for channel in xrange(len(vsnk)):
-        absolute = np.absolute(vsnk[channel].data())
-        integral = np.trapz(absolute)
+    def make():
+        num_taps = taps_per_phase * factor + 1
+        cutoff = passband + _transition(num_taps) / 2.0
+        taps = scipy.signal.firwin(num_taps, 2.0 * cutoff, window=("kaiser", LOWPASS_BETA))
+        taps.setflags(write=False)
+        return taps
 
-        # abs(complex) is complex modulous
-        areas.append(abs(integral))
+    return _cached(("lowpass", factor, passband, taps_per_phase), make)
 
-    return areas
 
-def phase_diff(channel):
+def decimate(vsnk, sample_rate, bandwidth, offset=0.0, taps_per_phase=16):
+    """
+    Pre-analysis stage for high rate captures: shifts `offset` Hz down to
+    0 Hz, low pass filters and keeps every factor'th sample. The filter is
+    flat across `bandwidth` (two-sided, in Hz) and its transition band ends
+    before the first alias of the decimated rate reaches it; factor is the
+    largest integer that allows. Works along the sample axis of a vsnk or
+    stacked capture.
+
+    Returns (capture, decimated sample rate), ready to be handed on, eg.
+    spectral_metrics(*decimate(vsnk, 260e6, 4e6)), so that the analysis
+    scales with the bandwidth rather than the sample rate. The filter runs
+    polyphase (scipy.signal.upfirdn) so only kept samples are computed.
+    Output sample k lines up with input sample k * factor, which needs an
+    even taps_per_phase.
+    """
+
+    if taps_per_phase % 2:
+        raise ValueError("taps_per_phase must be even, not %d" % taps_per_phase)
+
+    capture = stack(vsnk)
+    num_samples = capture.shape[-1]
+    dtype = np.result_type(capture.dtype, np.complex64)
+
+    # Passband edge, in input sample rates.
+    edge = bandwidth / 2.0 / sample_rate
+
+    factor = 1
+    for candidate in xrange(int(sample_rate // bandwidth), 1, -1):
+        if edge + _transition(taps_per_phase * candidate + 1) <= 1.0 / candidate - edge:
+            factor = candidate
+            break
+
+    if offset:
+        n = np.arange(num_samples)
+        capture = (capture * np.exp(-2j * np.pi * offset / sample_rate * n)).astype(dtype, copy=False)
+
+    if factor == 1:
+        return capture, float(sample_rate)
+
+    taps = lowpass(factor, edge, taps_per_phase)
+    filtered = scipy.signal.upfirdn(taps, capture, 1, factor, axis=-1)
+
+    # Drop the filter's group delay: (len(taps) - 1) / 2 input samples,
+    # a whole taps_per_phase / 2 output samples.
+    delay = taps_per_phase // 2
+    decimated = filtered[..., delay:delay + num_samples // factor]
+
+    return decimated.astype(dtype, copy=False), float(sample_rate) / factor
+
+
+def _is_channel(obj):
+    """True for vsnk channels (vector sinks and mocks alike)"""
+    return not isinstance(obj, (np.ndarray, np.generic)) and hasattr(obj, "data")
+
+
+def stack(vsnk):
+    """
+    Returns a vsnk as a (channels x samples) array. Arrays are returned as
+    they are; channels (anything with data()) and sequences are stacked.
+    A list of vsnks becomes a (vsnks x channels x samples) array.
+    """
+
+    if isinstance(vsnk, np.ndarray):
+        return vsnk
+
+    def rows(channel):
+        if _is_channel(channel):
+            return channel.data()
+        if isinstance(channel, (list, tuple)) and len(channel) and _is_channel(channel[0]):
+            return stack(channel)
+        return channel
+
+    return np.array([rows(channel) for channel in vsnk])
+
+
+def spectral_peaks(vsnk, sample_rate=1.0):
+    """
+    Returns the modulous peak, its FFT bin and its frequency for every
+    channel of a vsnk as three arrays, from a single FFT along the sample axis.
+    """
+
+    capture = stack(vsnk)
+
+    # Frequencies are complex. Make them modulous.
+    mods = np.absolute(fft(capture))
+
+    bins = np.argmax(mods, axis=-1)
+    peaks = mods[np.arange(len(mods)), bins]
+    freqs = np.fft.fftfreq(capture.shape[-1], 1.0 / sample_rate)[bins]
+
+    return peaks, bins, freqs
+
+
+def _db(ratio):
+    with np.errstate(divide="ignore"):
+        return 10.0 * np.log10(ratio)
+
+
+def spectral_metrics(vsnk, sample_rate=1.0, kind="blackmanharris", span=4,
+        harmonics=5, spur_threshold=10.0, max_spurs=8):
+    """
+    Windowed single tone measurements on a vsnk, a stacked capture or a
+    whole (points x channels x samples) sweep. Returns a dict of arrays,
+    one value per channel:
+
+        freq          fundamental frequency (the strongest bin)
+        snr           fundamental over noise, in dB
+        sfdr          fundamental over the strongest other bin, in dBc
+        thd           harmonics 2 to `harmonics` over fundamental, in dBc
+        noise_floor   mean noise power per bin, in dBc
+        spurs         per channel, the (frequency, dBc) list of local
+                      maxima at least `spur_threshold` dB above the noise
+                      floor, strongest first, at most `max_spurs`
+        overlap       whether the lobes of DC, the fundamental and its
+                      harmonics overlap, making the figures unreliable
+
+    Tones, harmonics (aliased round the complex spectrum) and DC occupy
+    the `span` bins either side of their centre, enough for the main lobe
+    of `kind`'s window. A bin claimed by several counts only once: for DC,
+    else the fundamental, else the lowest harmonic. Noise excludes them
+    all and is scaled back to the full band.
+    """
+
+    capture = stack(vsnk)
+    shape, num_samples = capture.shape[:-1], capture.shape[-1]
+    capture = capture.reshape(-1, num_samples)
+
+    spectra = fft(capture * window(num_samples, kind))
+    power = spectra.real ** 2 + spectra.imag ** 2
+
+    rows = np.arange(len(power))[:, None]
+    lobe = np.arange(-span, span + 1)
+
+    fundamental = np.argmax(power, axis=-1)
+
+    # (rows x harmonics), each harmonic's bin; then (rows x harmonics x lobe).
+    orders = np.arange(1, harmonics + 1)
+    centres = np.outer(fundamental, orders) % num_samples
+    lobes = (centres[:, :, None] + lobe) % num_samples
+
+    # DC first, then the fundamental and each harmonic keep the bins of
+    # their lobe not claimed before.
+    claimed = np.zeros(power.shape, dtype=bool)
+    claimed[:, lobe % num_samples] = True
+    overlap = np.zeros(len(power), dtype=bool)
+
+    totals = []
+    for order in xrange(harmonics):
+        mask = np.zeros(power.shape, dtype=bool)
+        mask[rows, lobes[:, order]] = True
+        overlap |= np.any(mask & claimed, axis=-1)
+
+        mask &= ~claimed
+        claimed |= mask
+        totals.append(np.sum(np.where(mask, power, 0.0), axis=-1))
+
+    signal = totals[0]
+    distortion = np.sum(totals[1:], axis=0)
+
+    # Everything that is not tone, harmonic or DC is noise.
+    noise_mask = ~claimed
+
+    bins = np.maximum(np.sum(noise_mask, axis=-1), 1)
+    noise_bin = np.sum(np.where(noise_mask, power, 0.0), axis=-1) / bins
+
+    # Strongest bin away from the fundamental and DC.
+    others = power.copy()
+    others[rows, lobes[:, 0]] = 0.0
+    others[:, lobe % num_samples] = 0.0
+    peak = power[rows[:, 0], fundamental]
+
+    freqs = np.fft.fftfreq(num_samples, 1.0 / sample_rate)
+
+    # Local maxima well above the noise, as spur candidates.
+    maxima = (others > np.roll(others, 1, axis=-1)) & (others >= np.roll(others, -1, axis=-1))
+    maxima &= others > noise_bin[:, None] * 10.0 ** (spur_threshold / 10.0)
+
+    spurs = np.empty(len(power), dtype=object)
+    for row, candidates in enumerate(maxima):
+        found = np.flatnonzero(candidates)
+        found = found[np.argsort(others[row, found])[::-1][:max_spurs]]
+        spurs[row] = list(zip(freqs[found], _db(others[row, found] / peak[row])))
+
+    return {
+        "freq": freqs[fundamental].reshape(shape),
+        "snr": _db(signal / (noise_bin * num_samples)).reshape(shape),
+        "sfdr": _db(peak / np.max(others, axis=-1)).reshape(shape),
+        "thd": _db(distortion / signal).reshape(shape),
+        "noise_floor": _db(noise_bin / peak).reshape(shape),
+        "spurs": spurs.reshape(shape),
+        "overlap": overlap.reshape(shape),
+    }
+
+
+def channel_peaks(vsnk):
+    """
+    Returns one modulous peak per channel for a vsnk.
+    """
+
+    return spectral_peaks(vsnk)[0]
+
+
+def absolute_area(vsnk, axis=-1):
+    """
+    Returns the aboslute area of a vsnk as the modulous of the complex number,
+    one per channel as an array. A (points x channels x samples) batch,
+    e.g. a whole amplitude sweep, gives a (points x channels) array.
+    """
+
+    absolute = np.absolute(stack(vsnk))
+    integral = np.trapz(absolute, axis=axis)
+
+    # abs(complex) is complex modulous
+    return np.absolute(integral)
+
+def phase_diff(channel, all_pairs=False):
     """
     Compute the phase differences between runs using the phase angle formula.
     NOTE: The phase differences of the channels are relative to the first run.
+
+    With all_pairs, returns the (runs x runs) matrix of phase differences
+    between every pair of runs instead.
     """
 
-    phase_diffs = []
+    # Double precision: small phases come from nearly equal large products.
+    runs = stack(channel).astype(np.complex128, copy=False)
+    norms = np.linalg.norm(runs, axis=-1)
 
-    for run in xrange(1, len(channel)):
-        phi = np.arcsin(np.dot(channel[0].data(),channel[run].data(),) / (np.linalg.norm(channel[0].data(),)*np.linalg.norm(channel[run].data(),)))
+    if all_pairs:
+        # Every pair at once: one matrix product.
+        dots = np.dot(runs, runs.T)
+        scale = np.outer(norms, norms)
+    else:
+        # Every run against the first: one matrix-vector product.
+        dots = np.dot(runs[1:], runs[0])
+        scale = norms[0] * norms[1:]
 
-        # Convert angle to proper domain
-        if (phi > np.pi) and (phi < np.pi * 3/2):
-            phi -= np.pi
-        elif (phi > np.pi * 3/2) and (phi < np.pi * 2):
-            phi = 2 * np.pi - phi
+    # arcsin lands in [-pi/2, pi/2], already the proper domain.
+    phi = np.arcsin(dots / scale)
 
-        # Phase difference is complex so take the magnitude.
-        phase_diffs.append(abs(phi))
+    # Phase difference is complex so take the magnitude.
+    return np.absolute(phi)
 
-    return phase_diffs
+def channel_coherence(vsnk):
+    """
+    Compares every channel of a vsnk with every other. Returns the
+    (channels x channels) matrices of RMS magnitude error, phase offset
+    (radians, row relative to column) and normalized cross-correlation,
+    and the (row, column) pair with the largest magnitude error.
 
-def dump(vsnk):
+    Each matrix comes from one Gram product over the samples.
     """
-    Prints a vsnk in channel column layout in IQ format for all channels.
+
+    capture = stack(vsnk).astype(np.complex128, copy=False)
+    num_samples = capture.shape[-1]
+
+    # Complex Gram: cross-correlation at zero lag of every pair.
+    gram = np.dot(capture, capture.conj().T)
+    power = np.real(np.diag(gram))
+
+    # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b over the magnitudes.
+    mags = np.absolute(capture)
+    dots = np.dot(mags, mags.T)
+    squares = power[:, None] + power[None, :] - 2.0 * dots
+    mag_error = np.sqrt(np.maximum(squares, 0.0) / num_samples)
+
+    phase_offset = np.angle(gram)
+
+    norms = np.sqrt(power)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xcorr = np.nan_to_num(np.absolute(gram) / np.outer(norms, norms))
+
+    worst = np.unravel_index(np.argmax(mag_error), mag_error.shape)
+
+    return mag_error, phase_offset, xcorr, worst
+
+
+def channel_delays(vsnk, sample_rate=1.0, reference=0):
+    """
+    Estimates the delay of every channel of a vsnk relative to the
+    `reference` channel from the peak of their cross-correlation, refined
+    with a parabola through the peak and its neighbours. Returns the delays
+    in fractional samples and in seconds as two arrays; positive when the
+    channel lags the reference.
+
+    All channels are correlated at once through one zero padded FFT along
+    the sample axis, so the cost is O(N log N) rather than O(N^2).
     """
 
-    for sample in xrange(len(vsnk[0].data())):
+    capture = stack(vsnk)
+    num_samples = capture.shape[-1]
+
+    # Zero padding to 2N keeps the correlation linear, not circular.
+    padded = np.zeros((len(capture), 2 * num_samples), dtype=np.complex128)
+    padded[:, :num_samples] = capture
+    spectra = fft(padded)
+
+    corr = np.absolute(np.fft.ifft(spectra * np.conj(spectra[reference]), axis=-1))
+
+    rows = np.arange(len(corr))
+    peaks = np.argmax(corr, axis=-1)
+    left = corr[rows, peaks - 1]
+    centre = corr[rows, peaks]
+    right = corr[rows, (peaks + 1) % corr.shape[-1]]
 
-        for channel in xrange(len(vsnk)):
-            datum = vsnk[channel].data()[sample]
-            sys.stdout.write("%10.5f %10.5f\t" % (datum.real, datum.imag))
+    # Vertex of the parabola through the three points.
+    curve = left - 2.0 * centre + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(curve != 0.0, 0.5 * (left - right) / curve, 0.0)
 
-        sys.stdout.write("\n")
+    # Lags past N wrap round to negative delays.
+    lags = np.where(peaks >= num_samples, peaks - 2 * num_samples, peaks)
+    delays = lags + shift
 
-    # For extra separation.
-    sys.stdout.write("\n")
+    return delays, delays / sample_rate
 
 
-def to_mag(vsnk):
+def _chunk(chunk):
+    """A chunk as a (channels x samples) array"""
+    return np.atleast_2d(stack(chunk))
+
+
+class RunningMetric(object):
     """
-    Converts the IQ sinusoids from each channel into a single sinusoid.
+    Base of the streaming metrics. Feed consecutive (channels x samples)
+    chunks, from a ring buffer, a generator or a flowgraph, to update()
+    and read result() at any time; memory use is bounded by the chunk size.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+
+    def update(self, chunk):
+        chunk = _chunk(chunk)
+        if chunk.shape[-1]:
+            self._update(chunk)
+            self.samples += chunk.shape[-1]
+        return self
+
+    def _update(self, chunk):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class RunningPeak(RunningMetric):
+    """
+    Peak modulous per channel. `index` holds the sample index of each peak.
+    """
+
+    def reset(self):
+        RunningMetric.reset(self)
+        self.peak = None
+        self.index = None
+
+    def _update(self, chunk):
+        mods = np.absolute(chunk)
+        bins = np.argmax(mods, axis=-1)
+        peaks = mods[np.arange(len(mods)), bins]
+
+        if self.peak is None:
+            self.peak = peaks
+            self.index = bins + self.samples
+            return
+
+        higher = peaks > self.peak
+        self.peak = np.where(higher, peaks, self.peak)
+        self.index = np.where(higher, bins + self.samples, self.index)
+
+    def result(self):
+        return self.peak
+
+
+class RunningArea(RunningMetric):
+    """
+    absolute_area() of everything seen so far. The last sample of each
+    chunk is carried over so the trapezoid across chunks is not lost.
+    """
+
+    def reset(self):
+        RunningMetric.reset(self)
+        self.integral = None
+        self._last = None
+
+    def _update(self, chunk):
+        absolute = np.absolute(chunk)
+        if self._last is not None:
+            absolute = np.concatenate((self._last, absolute), axis=-1)
+
+        integral = np.trapz(absolute, axis=-1)
+        self.integral = integral if self.integral is None else self.integral + integral
+        self._last = absolute[:, -1:].copy()
+
+    def result(self):
+        return np.absolute(self.integral)
+
+
+class RunningPower(RunningMetric):
+    """
+    Mean power, |x|^2, per channel.
+    """
+
+    def reset(self):
+        RunningMetric.reset(self)
+        self.energy = None
+
+    def _update(self, chunk):
+        energy = np.sum(chunk.real ** 2 + chunk.imag ** 2, axis=-1)
+        self.energy = energy if self.energy is None else self.energy + energy
+
+    def result(self):
+        return self.energy / self.samples
+
+
+class RunningPhase(RunningMetric):
+    """
+    Phase of every channel relative to the `reference` channel, in radians,
+    from the accumulated cross product of each channel with the reference.
+    """
+
+    def __init__(self, reference=0):
+        self.reference = reference
+        RunningMetric.__init__(self)
+
+    def reset(self):
+        RunningMetric.reset(self)
+        self.cross = None
+
+    def _update(self, chunk):
+        chunk = chunk.astype(np.complex128, copy=False)
+        cross = np.dot(chunk, np.conj(chunk[self.reference]))
+        self.cross = cross if self.cross is None else self.cross + cross
+
+    def result(self):
+        return np.angle(self.cross)
+
+
+class WelchPSD(RunningMetric):
+    """
+    Welch-averaged, two-sided power spectral density per channel over
+    segments of `nperseg` samples overlapping by `noverlap` (nperseg / 2 by
+    default). Samples short of a full segment wait for the next chunk.
+
+    result() returns (freqs, psd) in fftfreq order, psd being
+    (channels x nperseg), as scipy.signal.welch(return_onesided=False,
+    detrend=False).
     """
 
-    holder = []
-    for channel in xrange(len(vsnk)):
+    def __init__(self, nperseg=1024, sample_rate=1.0, window="hann", noverlap=None):
+        self.nperseg = nperseg
+        self.noverlap = nperseg // 2 if noverlap is None else noverlap
+        self.sample_rate = float(sample_rate)
+        self.window = window
+        RunningMetric.__init__(self)
+
+    def reset(self):
+        RunningMetric.reset(self)
+        self.segments = 0
+        self._sum = None
+        self._pending = None
+
+    def _update(self, chunk):
+        if self._pending is not None:
+            chunk = np.concatenate((self._pending, chunk), axis=-1)
+
+        step = self.nperseg - self.noverlap
+        count = (chunk.shape[-1] - self.noverlap) // step if chunk.shape[-1] >= self.nperseg else 0
+
+        if count:
+            # (channels x segments x nperseg), as views of the chunk.
+            strides = chunk.strides[:-1] + (chunk.strides[-1] * step, chunk.strides[-1])
+            segments = np.lib.stride_tricks.as_strided(chunk,
+                shape=(len(chunk), count, self.nperseg), strides=strides)
+
+            spectra = fft(segments * window(self.nperseg, self.window))
+            power = np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=1)
+
+            self._sum = power if self._sum is None else self._sum + power
+            self.segments += count
 
-        channel_data = []
-        for sample in xrange(len(vsnk[0].data())):
+        self._pending = chunk[:, count * step:].copy()
+
+    def result(self):
+        win = window(self.nperseg, self.window)
+        freqs = np.fft.fftfreq(self.nperseg, 1.0 / self.sample_rate)
+        if not self.segments:
+            return freqs, None
+        return freqs, self._sum / (self.segments * self.sample_rate * np.sum(win ** 2))
+
+
+# Binary dump header: magic, version, sample format, channels, decimation,
+# samples per channel. Each channel then follows in turn as interleaved IQ.
+DUMP_HEADER = struct.Struct("<4sBBHIQ")
+DUMP_MAGIC = b"PVDP"
+DUMP_FORMATS = {"sc16": 0, "fc32": 1}
+
+# Rows formatted per write in text mode.
+DUMP_BLOCK = 4096
+
+def dump(vsnk, stream=None, fmt="text", decimation=1, head=None, tail=None):
+    """
+    Prints a vsnk in channel column layout in IQ format for all channels.
+
+    fmt "sc16" or "fc32" instead writes a DUMP_HEADER followed by the raw
+    samples. Only every `decimation`th sample is kept, and `head` / `tail`
+    limit the dump to the first / last samples after decimation (both:
+    the first head then the last tail samples).
+    """
+
+    if stream is None:
+        stream = sys.stdout
+
+    capture = stack(vsnk)[:, ::decimation]
+
+    num_samples = capture.shape[-1]
+    if head is not None or tail is not None:
+        keep = np.zeros(num_samples, dtype=bool)
+        if head is not None:
+            keep[:head] = True
+        if tail is not None and tail > 0:
+            keep[-tail:] = True
+        capture = capture[:, keep]
+
+    if fmt == "text":
+        row = "%10.5f %10.5f\t" * len(capture) + "\n"
+
+        # Samples x (channel IQ pairs), formatted a block of rows at a time.
+        iq = np.empty((capture.shape[-1], 2 * len(capture)))
+        iq[:, 0::2] = capture.real.T
+        iq[:, 1::2] = capture.imag.T
+
+        for start in xrange(0, len(iq), DUMP_BLOCK):
+            block = iq[start:start + DUMP_BLOCK]
+            stream.write((row * len(block)) % tuple(block.ravel()))
+
+        # For extra separation.
+        stream.write("\n")
+
+    elif fmt in DUMP_FORMATS:
+        stream.write(DUMP_HEADER.pack(DUMP_MAGIC, 1, DUMP_FORMATS[fmt],
+            len(capture), decimation, capture.shape[-1]))
+
+        for channel in capture:
+            if fmt == "sc16":
+                channel = to_sc16(channel)
+            else:
+                channel = np.ascontiguousarray(channel, dtype=np.complex64)
+
+            # Straight from the array's memory.
+            stream.write(channel.data)
+
+    else:
+        raise ValueError("Unknown dump format %r" % fmt)
+
+
+def to_mag(vsnk, dtype=np.float64, out=None):
+    """
+    Converts the IQ sinusoids from each channel into a single sinusoid.
+    Returns a (channels x samples) array of `dtype`, written into `out`
+    instead when given so repeated calls can reuse one buffer.
+    """
 
-            datum = vsnk[channel].data()[sample]
-            channel_data.append(np.sqrt(datum.real*datum.real + datum.imag*datum.imag))
+    capture = stack(vsnk)
 
-        holder.append(channel_data)
+    if out is None:
+        out = np.empty(capture.shape, dtype=dtype)
 
-    return holder
+    return np.absolute(capture, out=out)